@@ -0,0 +1,48 @@
+"""
+Cache Benchmark
+===============
+Cold csv load (parse, clean, categorize, write cache) versus warm cache load
+
+Run from the repository root:
+    python -m benchmarks.bench_cache
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_export
+from finanalyzer.cache import load_transactions
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    """Runtime function"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'cold csv':>10} {'warm':>10} {'warm 3 cols':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for n_rows in args.rows:
+            csv = tmp / f"{n_rows}.csv"
+            write_export(csv, n_rows)
+            cache_dir = tmp / f"cache-{n_rows}"
+            cold = timed(lambda: load_transactions(csv, cache_dir=cache_dir))
+            warm = min(timed(lambda: load_transactions(csv, cache_dir=cache_dir)) for _ in range(3))
+            narrow = min(
+                timed(lambda: load_transactions(csv, ["Date", "Category", "Amount"], cache_dir))
+                for _ in range(3)
+            )
+            print(f"{n_rows:>10} {cold:>9.3f}s {warm:>9.3f}s {narrow:>11.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Categorizer Benchmark
+=====================
+Compares the old per-row linear scan in recategorize() with the compiled
+Categorizer index at 10k/100k/1M rows
+
+Run from the repository root:
+    python -m benchmarks.bench_categorizer
+"""
+
+import argparse
+import random
+import timeit
+
+import pandas as pd
+
+from finanalyzer.categorizer import Categorizer
+
+
+def make_mapping(n_merchants: int, n_categories: int = 20, seed: int = 0) -> dict[str, list[str]]:
+    """Synthetic mapping of n_merchants descriptions spread over n_categories"""
+    rng = random.Random(seed)
+    mapping = {f"Category {i}": [] for i in range(n_categories)}
+    keys = list(mapping)
+    for i in range(n_merchants):
+        mapping[rng.choice(keys)].append(f"Merchant {i}")
+    return mapping
+
+
+def make_descriptions(n_rows: int, n_merchants: int, seed: int = 0) -> pd.Series:
+    """Synthetic Description column, about 5% of rows are unmapped"""
+    rng = random.Random(seed)
+    upper = int(n_merchants * 1.05)
+    return pd.Series([f"Merchant {rng.randrange(upper)}" for _ in range(n_rows)])
+
+
+def linear_scan(mapping: dict[str, list[str]]):
+    """The pre-index recategorize() implementation"""
+
+    def recategorize(x):
+        for key in mapping.keys():
+            if x in mapping[key]:
+                return key
+
+    return recategorize
+
+
+def main():
+    """Runtime function"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--merchants", type=int, default=2000)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument(
+        "--legacy-max",
+        type=int,
+        default=100_000,
+        help="skip the linear scan above this many rows, it takes minutes",
+    )
+    args = parser.parse_args()
+
+    mapping = make_mapping(args.merchants)
+    build = timeit.timeit(lambda: Categorizer(mapping), number=10) / 10
+    print(f"index build ({args.merchants} merchants): {build * 1000:.2f} ms")
+
+    categorizer = Categorizer(mapping)
+    recategorize = linear_scan(mapping)
+    print(f"{'rows':>10} {'linear scan':>14} {'indexed':>14} {'speedup':>10}")
+    for n_rows in args.rows:
+        descriptions = make_descriptions(n_rows, args.merchants)
+        indexed = min(timeit.repeat(lambda: categorizer.categorize(descriptions), number=1, repeat=3))
+        if n_rows <= args.legacy_max:
+            legacy = timeit.timeit(lambda: descriptions.apply(recategorize), number=1)
+            print(f"{n_rows:>10} {legacy:>13.3f}s {indexed:>13.3f}s {legacy / indexed:>9.0f}x")
+        else:
+            print(f"{n_rows:>10} {'skipped':>14} {indexed:>13.3f}s {'':>10}")
+
+
+if __name__ == "__main__":
+    main()
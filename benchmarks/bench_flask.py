@@ -0,0 +1,74 @@
+"""
+Flask Benchmark
+===============
+Requests per second through the Flask app, in process, from several client threads
+
+Each thread logs in once and then repeatedly requests a page and a static file,
+so the numbers are dominated by per-request overhead (connections, user lookup).
+
+Run from the repository root:
+    python -m benchmarks.bench_flask
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from flask import Flask
+
+from flaskapp.app import create_app
+from flaskapp.app.db import get_db
+
+PATHS = {"page": "/", "static": "/static/styles.css"}
+
+
+def run(app: Flask, path: str, threads: int, requests: int) -> float:
+    """Requests per second for path, from threads of logged in clients"""
+
+    def client_thread() -> None:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = 1
+        for _ in range(requests):
+            response = client.get(path)
+            assert response.status_code == 200, response.status_code
+            response.close()
+
+    workers = [threading.Thread(target=client_thread) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * requests / (time.perf_counter() - start)
+
+
+def main():
+    """Runtime function"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2_000, help="requests per thread")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(
+            {
+                "DATABASE": Path(tmp, "bench.sqlite"),
+                "TRANSACTIONS": Path(tmp, "transactions"),
+            }
+        )
+        with app.app_context():
+            db = get_db()
+            # never logged in with, the session is set directly
+            db.execute("INSERT INTO user (username, password) VALUES ('bench', '')")
+            db.commit()
+
+        print(f"{args.threads} threads x {args.requests} requests")
+        for name, path in PATHS.items():
+            print(f"{name:>8} {run(app, path, args.threads, args.requests):>9.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Hashing Benchmark
+=================
+Cost of hashing and verifying a password on this host, per scheme and rounds
+
+Use it to pick PASSWORD_SCHEMES and PASSWORD_ROUNDS for the deployment host:
+every login costs one verify of CPU on a worker. Schemes whose backend isn't
+installed (bcrypt, argon2) are skipped.
+
+Run from the repository root:
+    python -m benchmarks.bench_hashing
+    python -m benchmarks.bench_hashing --schemes sha256_crypt --rounds 100000 535000 1000000
+"""
+
+import argparse
+import time
+
+from passlib.exc import MissingBackendError
+
+from flaskapp.app.auth import password_context
+
+PASSWORD = "Correct-Horse-9-Battery"
+
+
+def main():
+    """Runtime function"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--schemes", nargs="+", default=["sha256_crypt", "sha512_crypt", "pbkdf2_sha256", "bcrypt"]
+    )
+    parser.add_argument("--rounds", nargs="+", type=int, help="defaults to each scheme's default")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'scheme':>14} {'rounds':>9} {'hash':>9} {'verify':>9} {'logins/s':>9}")
+    for scheme in args.schemes:
+        for rounds in args.rounds or [None]:
+            context = password_context([scheme], {} if rounds is None else {scheme: rounds})
+            try:
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    hashed = context.hash(PASSWORD)
+                hash_seconds = (time.perf_counter() - start) / args.repeat
+            except MissingBackendError:
+                print(f"{scheme:>14} no backend installed")
+                break
+            except ValueError as error:
+                # scheme without rounds, or rounds out of range
+                print(f"{scheme:>14} {error}")
+                continue
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                context.verify(PASSWORD, hashed)
+            verify_seconds = (time.perf_counter() - start) / args.repeat
+
+            used = context.handler(scheme).from_string(hashed).rounds
+            print(
+                f"{scheme:>14} {used:>9} {hash_seconds * 1000:>7.1f}ms "
+                f"{verify_seconds * 1000:>7.1f}ms {1 / verify_seconds:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Memory Benchmark
+================
+Bytes per transaction of each transaction frame layout
+
+Layouts, all of the same synthetic export:
+    raw      pd.read_csv of the export, float Amount and object strings
+    cleaned  clean_transactions, object strings and float Amount
+    compact  what read_csv returns by default, categoricals with a float Amount
+    lean     read_csv(..., lean=True), int32 Day, int64 Cents and categorical strings
+
+Sizes are DataFrame.memory_usage(deep=True), so object strings and categorical
+dictionaries are counted in full.
+
+Run from the repository root:
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --rows 1000000 --columns
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.synthetic import write_export
+from finanalyzer.categorizer import Categorizer
+from finanalyzer.transactions import clean_transactions, compact, expand, lean
+
+
+def layouts(csv: Path, categorizer: Categorizer) -> dict[str, pd.DataFrame]:
+    """layout -> frame"""
+    raw = pd.read_csv(csv)
+    cleaned = clean_transactions(raw.copy(), categorizer)
+    compacted = compact(cleaned)
+    return {"raw": raw, "cleaned": cleaned, "compact": expand(compacted), "lean": lean(compacted)}
+
+
+def main():
+    """Runtime function"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--columns", action="store_true", help="also print bytes per transaction per column")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in args.rows:
+            csv = Path(tmp, f"{n_rows}.csv")
+            categorizer = Categorizer(write_export(csv, n_rows, seed=args.seed))
+            frames = layouts(csv, categorizer)
+            csv.unlink()
+
+            print(f"{n_rows} rows")
+            baseline = frames["cleaned"].memory_usage(deep=True, index=False).sum()
+            for name, df in frames.items():
+                usage = df.memory_usage(deep=True, index=False)
+                total = usage.sum()
+                print(
+                    f"{name:>9} {total / len(df):>8.1f} B/transaction "
+                    f"{total / 2**20:>9.1f}MB {total / baseline:>7.0%} of cleaned"
+                )
+                if args.columns:
+                    for column, size in usage.items():
+                        print(f"{'':>9}   {column:<22} {size / len(df):>8.1f} B/transaction")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Parallel Benchmark
+==================
+Scaling of parallel ingestion from 1 to N worker processes
+
+Run from the repository root:
+    python -m benchmarks.bench_parallel
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_export
+from finanalyzer.parallel import clean_parallel
+
+
+def main():
+    """Runtime function"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=250_000, help="rows per file")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--piece-mb", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            paths.append(Path(tmp, f"{i}.csv"))
+            write_export(paths[-1], args.rows, seed=i)
+
+        baseline = None
+        workers = 1
+        print(f"{args.files} files x {args.rows} rows")
+        print(f"{'workers':>8} {'time':>9} {'speedup':>8}")
+        while workers <= args.max_workers:
+            start = time.perf_counter()
+            clean_parallel(paths, workers, args.piece_mb * 1024 * 1024)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>8.2f}s {baseline / elapsed:>7.2f}x")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
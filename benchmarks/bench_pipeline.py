@@ -0,0 +1,161 @@
+"""
+Pipeline Benchmark
+==================
+Time and peak memory of each analysis stage on synthetic exports of growing size
+
+Stages run in order on the output of the one before:
+    parse          pd.read_csv of the export
+    clean          clean_transactions, categorizing with mappings that match the export
+    recategorize   categorize() of the cleaned transactions again
+    year           Year(...) construction for the most recent year
+    visualize_all  the year's category totals, what visualize() plots, on a new Year
+    months         every month's summary, on a new Year
+    rollup         the year's weekly rollup
+    recurring      recurring transactions over the whole history
+
+Times are the best of --repeat runs. Peak memory is measured in a separate run under
+tracemalloc, which tracks numpy and pandas buffers, so it doesn't slow the timings.
+Save results with --save and pass them to --compare on a later run to flag regressions.
+
+Run from the repository root:
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --rows 1000 100000 1000000 10000000 --save before.json
+    python -m benchmarks.bench_pipeline --compare before.json
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.synthetic import write_export
+from finanalyzer.analyze_finances import Year
+from finanalyzer.categorizer import Categorizer
+from finanalyzer.recurring import detect_recurring
+from finanalyzer.transactions import categorize, clean_transactions
+
+# slower or bigger than the saved run by more than this counts as a regression
+TOLERANCE = 1.25
+
+
+def stages(csv: Path, categorizer: Categorizer) -> list[tuple[str, Callable[[dict], object]]]:
+    """(name, stage) pairs, each stage reads what it needs from a shared state dict"""
+
+    def parse(state: dict) -> None:
+        state["raw"] = pd.read_csv(csv)
+
+    def clean(state: dict) -> None:
+        state["df"] = clean_transactions(state["raw"].copy(), categorizer)
+
+    def recategorize(state: dict) -> None:
+        categorize(state["df"], categorizer)
+
+    def year(state: dict) -> None:
+        state["year_number"] = state["df"]["Date"].max().year
+        state["year"] = Year(state["year_number"], state["df"])
+
+    def visualize_all(state: dict) -> None:
+        # a fresh Year each time, the summary is cached on the instance
+        Year(state["year_number"], state["df"]).visualize_all()
+
+    def months(state: dict) -> None:
+        for month in Year(state["year_number"], state["df"]).months[1:]:
+            month.summary()
+
+    def rollup(state: dict) -> None:
+        state["year"].rollup("week")
+
+    def recurring(state: dict) -> None:
+        detect_recurring(state["df"])
+
+    return [
+        ("parse", parse),
+        ("clean", clean),
+        ("recategorize", recategorize),
+        ("year", year),
+        ("visualize_all", visualize_all),
+        ("months", months),
+        ("rollup", rollup),
+        ("recurring", recurring),
+    ]
+
+
+def run(csv: Path, categorizer: Categorizer, repeat: int) -> dict[str, dict[str, float]]:
+    """stage -> {"seconds", "peak_mb"}"""
+    results = {}
+    state = {}
+    for name, stage in stages(csv, categorizer):
+        seconds = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stage(state)
+            seconds = min(seconds, time.perf_counter() - start)
+
+        tracemalloc.start()
+        stage(state)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"seconds": seconds, "peak_mb": peak / 2**20}
+    return results
+
+
+def regressions(results: dict, previous: dict) -> list[str]:
+    """Stages more than TOLERANCE slower or bigger than in the previous results"""
+    found = []
+    for rows, by_stage in results.items():
+        for name, now in by_stage.items():
+            before = previous.get(rows, {}).get(name)
+            if before is None:
+                continue
+            for metric in ("seconds", "peak_mb"):
+                # ignore noise on stages too quick or small to matter
+                floor = 0.01 if metric == "seconds" else 1.0
+                if now[metric] > max(before[metric], floor) * TOLERANCE:
+                    found.append(f"{rows} rows {name}: {metric} {before[metric]:.3f} -> {now[metric]:.3f}")
+    return found
+
+
+def main():
+    """Runtime function"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", type=Path, help="write results as json")
+    parser.add_argument("--compare", type=Path, help="exit 1 on regressions against saved results")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in args.rows:
+            csv = Path(tmp, f"{n_rows}.csv")
+            categorizer = Categorizer(write_export(csv, n_rows, seed=args.seed))
+            results[str(n_rows)] = run(csv, categorizer, args.repeat)
+            csv.unlink()
+
+            print(f"{n_rows} rows")
+            for name, result in results[str(n_rows)].items():
+                rate = n_rows / result["seconds"] if result["seconds"] else float("inf")
+                print(
+                    f"{name:>14} {result['seconds']:>9.4f}s {rate:>12,.0f} rows/s "
+                    f"{result['peak_mb']:>9.1f}MB peak"
+                )
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2), encoding="UTF-8")
+    if args.compare:
+        found = regressions(results, json.loads(args.compare.read_text(encoding="UTF-8")))
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Startup Benchmark
+=================
+Cold import time of the CLI and of a web worker, against the budget in startup_budget.json
+
+Each target is imported in a fresh interpreter with python -X importtime, the reported
+time is the median over --repeat runs of everything imported beyond a bare interpreter.
+The worker target imports flaskapp.wsgi, so it includes create_app(), pointed at a
+temporary instance. Modules listed as forbidden (e.g. matplotlib.pyplot) must not be
+imported by any target.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --check    # exit 1 when over budget
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+TARGETS = {
+    "cli": "import finanalyzer.analyze_finances",
+    "database": "import finanalyzer.database",
+    "web": "import flaskapp.app",
+    "worker": "import flaskapp.wsgi",
+}
+
+BUDGET_PATH = Path(__file__).with_name("startup_budget.json")
+
+
+def import_times(code: str, env: dict[str, str]) -> dict[str, tuple[int, int]]:
+    """module -> (depth, cumulative microseconds) as reported by -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times[name.strip()] = (depth, int(cumulative))
+    return times
+
+
+def measure(code: str, env: dict[str, str], startup: set[str]) -> tuple[float, set[str]]:
+    """Milliseconds spent on imports beyond interpreter startup, and every module imported"""
+    times = import_times(code, env)
+    total = sum(
+        cumulative
+        for name, (depth, cumulative) in times.items()
+        if depth == 0 and name not in startup
+    )
+    return total / 1000, set(times)
+
+
+def main():
+    """Runtime function"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="exit 1 if any budget is exceeded")
+    args = parser.parse_args()
+
+    budget = json.loads(BUDGET_PATH.read_text(encoding="UTF-8"))
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+        for setting in ("DATABASE", "TRANSACTIONS", "UPLOADS", "LOG_DIR"):
+            env[f"FLASK_{setting}"] = str(Path(tmp, setting.lower()))
+        startup = set(import_times("pass", env))
+
+        print(f"{'target':>9} {'median':>9} {'budget':>9}")
+        for target, code in TARGETS.items():
+            runs = [measure(code, env, startup) for _ in range(args.repeat)]
+            median = statistics.median(ms for ms, _ in runs)
+            limit = budget["milliseconds"][target]
+            over = median > limit
+            print(f"{target:>9} {median:>7.0f}ms {limit:>7.0f}ms{'  OVER BUDGET' if over else ''}")
+
+            forbidden = set(budget["forbidden"]) & runs[0][1]
+            if forbidden:
+                print(f"{'':>9} imports {', '.join(sorted(forbidden))}")
+            failed = failed or over or bool(forbidden)
+
+    if args.check and failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Synthetic Data
+==============
+Seeded generator of bank style exports and category mappings to match
+
+Exports have the Date,Description,Original Description,Category,Amount,Status layout.
+Merchant popularity follows a Zipf-like curve (a handful of merchants make up most
+transactions, with a long tail seen once or twice), amounts are log-normal per category,
+and income, rent and a couple of subscriptions (one with a price rise) recur monthly.
+Files are written in chunks, so 10M rows never need more than one chunk in memory.
+The same seed always gives the same file.
+
+Command line:
+    python -m benchmarks.synthetic 1000000 export.csv --mappings mappings.json
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from finanalyzer.mappings import save_mappings
+
+COLUMNS = ["Date", "Description", "Original Description", "Category", "Amount", "Status"]
+
+# category: (share of merchants, median amount, bank's category)
+CATEGORIES = {
+    "Groceries": (0.12, 45.0, "Groceries"),
+    "Restaurants": (0.22, 25.0, "Food & Dining"),
+    "Coffee": (0.06, 6.0, "Food & Dining"),
+    "Shopping": (0.2, 35.0, "Shopping"),
+    "Gas": (0.06, 40.0, "Auto & Transport"),
+    "Transport": (0.05, 18.0, "Auto & Transport"),
+    "Utilities": (0.04, 90.0, "Bills & Utilities"),
+    "Subscriptions": (0.05, 14.0, "Entertainment"),
+    "Entertainment": (0.08, 30.0, "Entertainment"),
+    "Health": (0.05, 60.0, "Health & Fitness"),
+    "Travel": (0.05, 220.0, "Travel"),
+    "Internal Transfer": (0.02, 300.0, "Transfer"),
+}
+FIRST_WORDS = ["Blue", "Golden", "Corner", "Sunny", "Green", "Royal", "Urban", "Lucky", "Old", "North"]
+SECOND_WORDS = ["Market", "Cafe", "Grill", "Store", "Outlet", "Bistro", "Depot", "Studio", "Shop", "Bar"]
+CITIES = ["SEATTLE WA", "PORTLAND OR", "AUSTIN TX", "DENVER CO", "CHICAGO IL", "BOSTON MA"]
+START = np.datetime64("2015-01-01")
+# (day of month, description, original description, bank category, amount, amount from PRICE_RISE)
+SUBSCRIPTIONS = [
+    (3, "Hulu", "HLU*HULU 1860595027856-U HULU.COM/BILLCA", "Entertainment", -14.99, -17.99),
+    (16, "PlayStation", "PLAYSTATION NETWORK 800-345-7669 CA", "Entertainment", -4.99, -4.99),
+]
+PRICE_RISE = np.datetime64("2020-01")
+
+
+def default_merchants(n_rows: int) -> int:
+    """Distinct merchants for an export of n_rows, growing with it like a real history does"""
+    return int(np.clip(n_rows // 50, 100, 200_000))
+
+
+def make_merchants(n_merchants: int, seed: int = 0) -> pd.DataFrame:
+    """Merchant names, user categories and median amounts, most popular first"""
+    rng = np.random.default_rng(seed)
+    names = list(CATEGORIES)
+    shares = np.array([share for share, _, _ in CATEGORIES.values()])
+    category = rng.choice(len(names), n_merchants, p=shares / shares.sum())
+    first = np.array(FIRST_WORDS)[rng.integers(len(FIRST_WORDS), size=n_merchants)]
+    second = np.array(SECOND_WORDS)[rng.integers(len(SECOND_WORDS), size=n_merchants)]
+    number = pd.Series(np.arange(n_merchants)).astype(str)
+    name = pd.Series(first) + " " + pd.Series(second) + " " + number
+    return pd.DataFrame(
+        {
+            "Description": name,
+            "Category": np.array(names)[category],
+            "Median": np.array([median for _, median, _ in CATEGORIES.values()])[category],
+            "Bank Category": np.array([bank for _, _, bank in CATEGORIES.values()])[category],
+        }
+    )
+
+
+def make_mappings(merchants: pd.DataFrame, coverage: float = 0.95, seed: int = 0) -> dict[str, list[str]]:
+    """Category mappings covering about coverage of the merchants, the rest are left unmapped"""
+    rng = np.random.default_rng(seed + 1)
+    mapped = merchants[rng.random(len(merchants)) < coverage]
+    return {
+        category: descriptions.tolist()
+        for category, descriptions in mapped.groupby("Category", sort=True)["Description"]
+    }
+
+
+def make_chunk(
+    merchants: pd.DataFrame, n_rows: int, first_day: int, last_day: int, rng: np.random.Generator
+) -> pd.DataFrame:
+    """n_rows of purchases between two day offsets"""
+    ranks = np.arange(1, len(merchants) + 1)
+    popularity = 1 / ranks**1.1
+    merchant = merchants.iloc[rng.choice(len(merchants), n_rows, p=popularity / popularity.sum())]
+    days = rng.integers(first_day, last_day, n_rows)
+    amount = -np.round(merchant["Median"].to_numpy() * rng.lognormal(0, 0.6, n_rows), 2)
+    store = pd.Series(rng.integers(1, 10_000, n_rows)).astype(str).str.zfill(4)
+    city = pd.Series(np.array(CITIES)[rng.integers(len(CITIES), size=n_rows)])
+    description = merchant["Description"].reset_index(drop=True)
+    return pd.DataFrame(
+        {
+            "Date": (START + days).astype("datetime64[D]"),
+            "Description": description,
+            "Original Description": description.str.upper() + " #" + store + " " + city,
+            "Category": merchant["Bank Category"].to_numpy(),
+            "Amount": amount,
+            "Status": np.where(days >= last_day - 3, "Pending", "Posted"),
+        }
+    )
+
+
+def recurring(first_day: int, last_day: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Monthly paycheck, rent and subscriptions between two day offsets"""
+    months = np.arange(
+        (START + first_day).astype("datetime64[M]"), (START + last_day).astype("datetime64[M]")
+    )
+    rows = []
+    subscriptions = []
+    for month in months[::-1]:
+        day = month.astype("datetime64[D]")
+        rows.append((day + 14, "Acme Payroll", "ACME CORP PAYROLL PPD", "Paycheck", 4200.0))
+        rows.append((day, "Rent", "ONLINE PAYMENT RENT", "Mortgage & Rent", -1850.0))
+        for day_of_month, description, original, category, before, after in SUBSCRIPTIONS:
+            amount = after if month >= PRICE_RISE else before
+            subscriptions.append((day + day_of_month - 1, description, original, category, amount))
+    columns = ["Date", "Description", "Original Description", "Category", "Amount"]
+    df = pd.DataFrame(rows, columns=columns)
+    # paycheck and rent vary by a few dollars, subscriptions are exact
+    df["Amount"] = df["Amount"] + np.round(rng.normal(0, 1, len(df)), 2)
+    df = pd.concat([df, pd.DataFrame(subscriptions, columns=columns)], ignore_index=True)
+    df["Status"] = "Posted"
+    return df
+
+
+def write_export(
+    path: str | Path,
+    n_rows: int,
+    n_merchants: int | None = None,
+    seed: int = 0,
+    years: int = 10,
+    chunk_rows: int = 1_000_000,
+) -> dict[str, list[str]]:
+    """
+    Writes a synthetic bank export
+
+    Args:
+        Path path: csv to write
+        int n_rows: purchases, monthly income and rent come on top
+        int n_merchants: distinct merchants, defaults to default_merchants(n_rows)
+        int seed: random seed
+        int years: years of history from 2015-01-01
+        int chunk_rows: rows generated and written at a time
+    Returns:
+        category mappings that match the export
+    """
+    rng = np.random.default_rng(seed)
+    merchants = make_merchants(n_merchants or default_merchants(n_rows), seed)
+    days = years * 365
+    n_chunks = max(1, -(-n_rows // chunk_rows))
+    with open(path, "w", encoding="UTF-8", newline="") as export:
+        export.write(",".join(COLUMNS) + "\n")
+        # newest chunk first, so the whole file is newest first
+        for chunk in reversed(range(n_chunks)):
+            rows = n_rows // n_chunks + (chunk < n_rows % n_chunks)
+            first_day, last_day = days * chunk // n_chunks, days * (chunk + 1) // n_chunks
+            df = pd.concat(
+                [make_chunk(merchants, rows, first_day, last_day, rng), recurring(first_day, last_day, rng)]
+            )
+            df.sort_values("Date", ascending=False, kind="stable").to_csv(
+                export, header=False, index=False, columns=COLUMNS
+            )
+
+    mappings = make_mappings(merchants, seed=seed)
+    mappings["Income"] = ["Acme Payroll"]
+    mappings["Rent"] = ["Rent"]
+    mappings.setdefault("Subscriptions", []).extend(description for _, description, *_ in SUBSCRIPTIONS)
+    return mappings
+
+
+def main():
+    """Runtime function"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("rows", type=int)
+    parser.add_argument("csv", type=Path)
+    parser.add_argument("--mappings", type=Path, help="also write a matching category_mappings.json")
+    parser.add_argument("--merchants", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mappings = write_export(args.csv, args.rows, args.merchants, args.seed)
+    if args.mappings:
+        save_mappings(mappings, args.mappings)
+    print(f"Wrote {args.csv} with {sum(map(len, mappings.values()))} mapped descriptions")
+
+
+if __name__ == "__main__":
+    main()
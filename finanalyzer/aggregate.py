@@ -0,0 +1,178 @@
+"""
+Aggregate
+=========
+Vectorized per-category aggregation of transactions
+
+Everything here returns data, plotting lives with the period classes.
+Sums are taken in integer cents, so totals are exact whatever order rows are added in.
+Frames can be dated by a datetime Date column or by the lean frame's int32 Day number,
+see transactions.lean.
+"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+STATISTICS = {"sum": "Sum", "count": "Count", "mean": "Mean", "min": "Min", "max": "Max"}
+
+# named granularities, any other pandas frequency works too,
+# e.g. "YS-OCT" for fiscal years starting in October
+GRANULARITIES = {"day": "D", "week": "W-MON", "month": "MS", "quarter": "QS", "year": "YS"}
+
+# day number 0 of the lean frame's Day column
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def summarize(df: pd.DataFrame, freq: str | None = None) -> pd.DataFrame:
+    """
+    Per-category statistics of Amount in a single groupby, summed in cents
+
+    Args:
+        DataFrame df: cleaned transactions
+        str freq: optional granularity or pandas frequency to also split by period
+    Returns:
+        DataFrame indexed by Category (or by period and Category)
+        with Sum, Count, Mean, Min and Max columns
+    """
+    keys = ["Category"]
+    if freq is not None:
+        df = with_dates(df)
+        keys = [date_grouper(freq), "Category"]
+    cents = df.assign(Cents=amount_cents(df)).groupby(keys, observed=True, sort=True)["Cents"]
+    summary = cents.agg(["sum", "count", "min", "max"])
+    summary["mean"] = summary["sum"] / summary["count"]
+    summary = summary[list(STATISTICS)].rename(columns=STATISTICS)
+    summary[["Sum", "Mean", "Min", "Max"]] /= 100
+    return summary
+
+
+def period_totals(df: pd.DataFrame, freq: str = "month") -> pd.DataFrame:
+    """
+    Period by category totals in one groupby over the dates
+
+    Args:
+        DataFrame df: cleaned transactions, any date range
+        str freq: one of GRANULARITIES or a pandas frequency
+    Returns:
+        DataFrame of summed Amount, one row per period (including empty ones),
+        labelled by the period's first day, one column per category
+    """
+    freq = GRANULARITIES.get(freq, freq)
+    rollup = (
+        with_dates(df)
+        .assign(Cents=amount_cents(df))
+        .groupby([date_grouper(freq), "Category"], observed=True)["Cents"]
+        .sum()
+        .div(100)
+        .unstack("Category", fill_value=0.0)
+    )
+    return rollup.asfreq(freq, fill_value=0.0)
+
+
+def rolling_totals(df: pd.DataFrame, days: int) -> pd.DataFrame:
+    """Per-category totals over a trailing window of days, one row per day"""
+    return period_totals(df, "day").rolling(f"{days}D").sum()
+
+
+def date_grouper(freq: str) -> pd.Grouper:
+    """Group the Date column by freq, with every period labelled by its first day"""
+    freq = GRANULARITIES.get(freq, freq)
+    if freq.startswith("W"):
+        # weekly anchors are end-labelled by default
+        return pd.Grouper(key="Date", freq=freq, closed="left", label="left")
+    return pd.Grouper(key="Date", freq=freq)
+
+
+def to_cents(amount: pd.Series) -> pd.Series:
+    """Dollar amounts as int64 cents"""
+    return (amount * 100).round().astype("int64")
+
+
+def amount_cents(df: pd.DataFrame) -> pd.Series:
+    """Each transaction's amount in cents, from Cents when the frame has it"""
+    if "Cents" in df.columns:
+        return df["Cents"]
+    return to_cents(df["Amount"])
+
+
+def date_column(df: pd.DataFrame) -> str:
+    """Date, or Day for lean frames"""
+    return "Date" if "Date" in df.columns else "Day"
+
+
+def day_numbers(dates: pd.Series) -> np.ndarray:
+    """Dates as int32 days since EPOCH"""
+    return (dates.to_numpy().astype("datetime64[D]") - EPOCH).astype("int32")
+
+
+def day_number(day: date) -> int:
+    """A single date as days since EPOCH"""
+    return int((np.datetime64(day, "D") - EPOCH).astype(int))
+
+
+def to_dates(days: pd.Series) -> pd.Series:
+    """Day numbers back to datetime64 dates"""
+    return pd.Series((EPOCH + days.to_numpy()).astype("datetime64[ns]"), index=days.index, name="Date")
+
+
+def with_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """df with a Date column, rebuilt from Day for lean frames"""
+    if "Date" in df.columns:
+        return df
+    return df.assign(Date=to_dates(df["Day"]))
+
+
+class RunningTotals:
+    """
+    Period by category Sum and Count, folded in one chunk of transactions at a time
+
+    Only the accumulators are kept, so memory is bounded by the number of
+    periods and categories, not the number of transactions. Sums are kept in
+    integer cents so the result doesn't depend on how the input was chunked.
+    """
+
+    __freq: str
+    __totals: pd.DataFrame | None
+
+    def __init__(self, freq: str = "month") -> None:
+        self.__freq = GRANULARITIES.get(freq, freq)
+        self.__totals = None
+
+    def add(self, df: pd.DataFrame) -> None:
+        """Fold a chunk of cleaned transactions into the totals"""
+        part = (
+            with_dates(df)
+            .assign(Cents=amount_cents(df))
+            .groupby([date_grouper(self.__freq), "Category"], observed=True)["Cents"]
+            .agg(Cents="sum", Count="count")
+        )
+        if self.__totals is None:
+            self.__totals = part
+        else:
+            self.__totals = self.__totals.add(part, fill_value=0).astype("int64")
+
+    def summary(self) -> pd.DataFrame:
+        """Indexed by period and Category, with Sum and Count columns"""
+        if self.__totals is None:
+            return pd.DataFrame(columns=["Sum", "Count"])
+        return pd.DataFrame(
+            {"Sum": self.__totals["Cents"] / 100, "Count": self.__totals["Count"]}
+        ).sort_index()
+
+    def period_totals(self) -> pd.DataFrame:
+        """Same layout as period_totals()"""
+        rollup = self.summary()["Sum"].unstack("Category", fill_value=0.0)
+        return rollup.asfreq(self.__freq, fill_value=0.0)
+
+
+def totals(summary: pd.DataFrame, minimum: float = 1.0) -> pd.DataFrame:
+    """Absolute Sum per category, leaving out anything at or under the minimum"""
+    aggregated_df = summary[["Sum"]].abs()
+    return aggregated_df[aggregated_df["Sum"] > minimum]
+
+
+def split_income(summary: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Split an aggregation into its Income row(s) and its cost rows, without recomputing"""
+    is_income = summary.index.get_level_values("Category") == "Income"
+    return summary[is_income], summary[~is_income]
@@ -18,43 +18,130 @@ Additional Details:
     Planned updates: create a gui for user input about what graph they want to see
 """
 
-import os
+import argparse
+from collections.abc import Callable, Sequence
 from datetime import date, timedelta
+from functools import cached_property
+from pathlib import Path
 
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-from dateutil.relativedelta import relativedelta
 
-from .assets.category_mappings import category_mappings
+from .aggregate import (
+    GRANULARITIES,
+    date_column,
+    day_number,
+    period_totals,
+    rolling_totals,
+    split_income,
+    summarize,
+    totals,
+)
+from .budget import budget_status, load_budgets
+from .cache import load_transactions
+from .files import ASSETS_DIR
 from .generate_mappings import generate_mappings
+from .instrument import run_report, stage
+from .mappings import mappings_categorizer
+from .recurring import detect_recurring, price_changes
+from .render import draw_pie, render_pie
 
 
 class Time:
-    """Parent class"""
+    """
+    Parent class
 
-    __df: pd.DataFrame
+    A period is a [start, stop) slice of one date-sorted transaction frame that is
+    shared by the whole hierarchy, so building a period only costs a binary search
+    and child periods are only created when they are first accessed.
+    The frame can be a regular cleaned frame or a lean one (see transactions.lean).
+    """
 
-    def __init__(self, df: pd.DataFrame) -> None:
-        self.__df = df
+    __frame: pd.DataFrame
+    __start: int
+    __stop: int
+    __summary: pd.DataFrame | None
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        first: date | None = None,
+        end: date | None = None,
+        bounds: tuple[int, int] | None = None,
+    ) -> None:
+        if bounds is None:
+            # standalone period, sort once so every child can binary search
+            with stage("sort") as timed:
+                df = sort_by_date(df)
+                timed.rows = len(df)
+            bounds = (0, len(df))
+        self.__frame = df
+        self.__start, self.__stop = bounds
+        if first is not None:
+            self.__start, self.__stop = self._bounds(first, end)
+        self.__summary = None
+
+    def __len__(self) -> int:
+        return self.__stop - self.__start
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """The transactions in this period"""
+        return self.__frame.iloc[self.__start : self.__stop]
+
+    def _bounds(self, first: date, end: date) -> tuple[int, int]:
+        """Offsets of the transactions dated from first up to (not including) end"""
+        column = date_column(self.__frame)
+        dates = self.__frame[column].to_numpy()[self.__start : self.__stop]
+        if column == "Day":
+            keys = [day_number(first), day_number(end)]
+        else:
+            keys = [pd.Timestamp(first).to_datetime64(), pd.Timestamp(end).to_datetime64()]
+        start, stop = np.searchsorted(dates, keys)
+        return self.__start + int(start), self.__start + int(stop)
+
+    @property
+    def _frame(self) -> pd.DataFrame:
+        return self.__frame
+
+    @property
+    def _span_bounds(self) -> tuple[int, int]:
+        return self.__start, self.__stop
+
+    def _child(self, period: type, first: date):
+        """Build a child period over the same frame, searching only within this one"""
+        return period(first, self.__frame, bounds=self._span_bounds)
+
+    def summary(self) -> pd.DataFrame:
+        """Per-category Sum, Count, Mean, Min and Max for this period, computed once"""
+        if self.__summary is None:
+            with stage("aggregate") as timed:
+                timed.rows = len(self)
+                self.__summary = summarize(self.df)
+        return self.__summary
+
+    def rollup(self, freq: str = "month") -> pd.DataFrame:
+        """Period by category totals for any granularity, see aggregate.period_totals"""
+        return period_totals(self.df, freq)
+
+    def rolling(self, days: int) -> pd.DataFrame:
+        """Trailing totals per category over a window of days, one row per day"""
+        return rolling_totals(self.df, days)
+
+    def recurring(self) -> pd.DataFrame:
+        """Subscriptions and other recurring transactions in this period, see recurring.detect_recurring"""
+        return detect_recurring(self.df)
+
+    def price_changes(self) -> pd.DataFrame:
+        """Price changes of this period's recurring transactions"""
+        return price_changes(self.df)
 
     def visualize_all(self):
-        summ_dict = {}
-        for category in self.__df["Category"].unique():
-            category_df = self.__df[self.__df["Category"] == category]
-            summation = category_df["Amount"].sum()
-            summ_dict[category] = summation
-        aggregated_df = pd.DataFrame.from_dict(
-            summ_dict, orient="index", columns=["Sum"]
-        )
-        aggregated_df["Sum"] = aggregated_df["Sum"].apply(lambda x: abs(x))
-        aggregated_df = aggregated_df[aggregated_df["Sum"] > 1.0]
-
-        return aggregated_df
+        return totals(self.summary())
 
     def visualize_costs(self):
-        df = self.visualize_all()
-        df = df.drop(index="Income")
-        return df
+        _, costs = split_income(self.summary())
+        return totals(costs)
 
     def visualize(self, all: bool = True, just_costs: bool = False):
         if all & (~just_costs):
@@ -62,144 +149,232 @@ class Time:
         else:
             aggregated_df = self.visualize_costs()
 
-        plt.pie(
-            aggregated_df["Sum"],
-            labels=aggregated_df.index,
-            autopct="%1.1f%%",
-            radius=1.5,
-            rotatelabels=True,
-        )
+        with stage("plot"):
+            # deferred, pyplot is slow to import and only needed for interactive charts
+            import matplotlib.pyplot as plt
+
+            _, ax = plt.subplots()
+            draw_pie(ax, aggregated_df)
         plt.show()
 
+    def render(self, fmt: str = "png", just_costs: bool = False) -> bytes:
+        """Headless pie chart of this period as png or svg bytes, safe to call from any thread"""
+        aggregated_df = self.visualize_costs() if just_costs else self.visualize_all()
+        return render_pie(aggregated_df, fmt)
 
-class Day(Time):
-    __df: pd.DataFrame
 
-    def __init__(self, day: date, df: pd.DataFrame) -> None:
-        self.__df = df
-        super().__init__(df)
+class Periods(Sequence):
+    """Child periods, each one is only built the first time it is accessed"""
 
+    __anchors: list
+    __build: Callable[..., Time]
+    __built: dict[int, Time]
 
-class Week(Time):
-    __df: pd.DataFrame
-    __days: list[Day]
+    def __init__(self, anchors: list, build: Callable[..., Time]) -> None:
+        self.__anchors = anchors
+        self.__build = build
+        self.__built = {}
+
+    def __len__(self) -> int:
+        return len(self.__anchors)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        anchor = self.__anchors[i]
+        if anchor is None:
+            return None
+        i = i % len(self)
+        if i not in self.__built:
+            self.__built[i] = self.__build(anchor)
+        return self.__built[i]
 
-    def __init__(self, monday: date, df: pd.DataFrame) -> None:
-        self.__df = df
-        super().__init__(df)
-        self.__days = []  # 7
 
-        while monday.weekday() != 0:
-            monday = monday - timedelta(days=1)
+class Day(Time):
+    day: date
+
+    def __init__(
+        self, day: date, df: pd.DataFrame, bounds: tuple[int, int] | None = None
+    ) -> None:
+        self.day = day
+        super().__init__(df, day, day + timedelta(days=1), bounds)
 
-        tuesday = monday + timedelta(days=1)
-        wednesday = monday + timedelta(days=2)
-        thursday = monday + timedelta(days=3)
-        friday = monday + timedelta(days=4)
-        saturday = monday + timedelta(days=5)
-        sunday = monday + timedelta(days=6)
 
-        week = [monday, tuesday, wednesday, thursday, friday, saturday, sunday]
+class Week(Time):
+    """Monday to Sunday, clipped to the parent Month when built from one"""
+
+    monday: date
 
-        for i in range(7):
-            mask = self.__df["Date"] == week[i]
-            self.__days.append(Day(week[i], self.__df[mask]))
+    def __init__(
+        self, monday: date, df: pd.DataFrame, bounds: tuple[int, int] | None = None
+    ) -> None:
+        self.monday = monday - timedelta(days=monday.weekday())
+        super().__init__(df, self.monday, self.monday + timedelta(days=7), bounds)
+
+    @cached_property
+    def days(self) -> Periods:
+        """The 7 days of the week, Monday first"""
+        week = [self.monday + timedelta(days=i) for i in range(7)]
+        return Periods(week, lambda day: self._child(Day, day))
 
 
 class Month(Time):
-    __weeks: list[Week]
-    __month_of_year: int
-    __df: pd.DataFrame
-
-    def __init__(self, first: date, df: pd.DataFrame) -> None:
-        self.__df = df
-        super().__init__(df)
-        self.__weeks = []  # 5
-        self.__month_of_year = first.month
-
-        while first.day != 1:
-            first = first - timedelta(days=1)
-
-        last = first
-        while last.weekday() != 6:
-            last = last + timedelta(days=1)
-
-        i = 0
-        while (first.month == self.__month_of_year) & (first.day < 32):
-            mask = (
-                self.__df["Date"]
-                >= pd.to_datetime(f"{first.year}-{first.month}-{first.day}")
-            ) & (
-                self.__df["Date"]
-                <= pd.to_datetime(f"{last.year}-{last.month}-{last.day}")
-            )
-            self.__weeks.append(Week(first, self.__df[mask]))
-            first = last + timedelta(days=1)
-            last = first + timedelta(days=7)
-            if last.day > (last + relativedelta(day=31)).day:
-                last = last + relativedelta(day=31)
-            i += 1
+    first: date
+
+    def __init__(
+        self, first: date, df: pd.DataFrame, bounds: tuple[int, int] | None = None
+    ) -> None:
+        self.first = first.replace(day=1)
+        super().__init__(df, self.first, next_month(self.first), bounds)
+
+    @property
+    def month_of_year(self) -> int:
+        return self.first.month
+
+    def budget(self, budgets: dict[str, float] | None = None) -> pd.DataFrame:
+        """
+        This month's spending against monthly budgets, see budget.budget_status
+
+        Args:
+            dict budgets: category -> dollars, defaults to the user's saved budgets
+        """
+        if budgets is None:
+            budgets = load_budgets()
+        spent = -self.summary()["Sum"]
+        spent.index = spent.index.astype(object)
+        return budget_status(budgets, spent)
+
+    @cached_property
+    def weeks(self) -> Periods:
+        """Every Monday to Sunday week that overlaps the month"""
+        end = next_month(self.first)
+        monday = self.first - timedelta(days=self.first.weekday())
+        mondays = []
+        while monday < end:
+            mondays.append(monday)
+            monday += timedelta(days=7)
+        return Periods(mondays, lambda monday: self._child(Week, monday))
 
 
 class Year(Time):
-    months: list[Month]
-    __df: pd.DataFrame
-
-    def __init__(self, year: int, df: pd.DataFrame) -> None:
-        self.__df = df
-        super().__init__(df)
-
-        self.months = []  # 13. skipping 0 for ease of understanding. 1 = Jan etc
-        self.__df["Month"] = self.__df["Date"].apply(lambda x: x.month)
-        for i in range(13):
-            if i == 0:
-                self.months.append(0)
-            else:
-                mask = self.__df["Month"] == i
-                self.months.append(
-                    Month(date(year=year, month=i, day=1), self.__df[mask])
-                )
-
-
-def read_csv(name: str) -> pd.DataFrame:
+    year: int
+
+    def __init__(
+        self, year: int, df: pd.DataFrame, bounds: tuple[int, int] | None = None
+    ) -> None:
+        self.year = year
+        super().__init__(df, date(year, 1, 1), date(year + 1, 1, 1), bounds)
+
+    @cached_property
+    def months(self) -> Periods:
+        """13 slots, skipping 0 for ease of understanding. 1 = Jan etc"""
+        firsts = [None] + [date(self.year, i, 1) for i in range(1, 13)]
+        return Periods(firsts, lambda first: self._child(Month, first))
+
+
+class Span(Time):
+    """Any date range, from first up to (not including) end"""
+
+    first: date
+    end: date
+
+    def __init__(
+        self,
+        first: date,
+        end: date,
+        df: pd.DataFrame,
+        bounds: tuple[int, int] | None = None,
+    ) -> None:
+        self.first = first
+        self.end = end
+        super().__init__(df, first, end, bounds)
+
+    @classmethod
+    def last(cls, days: int, df: pd.DataFrame, today: date | None = None) -> "Span":
+        """Rolling window of the last days, today included"""
+        end = (today or date.today()) + timedelta(days=1)
+        return cls(end - timedelta(days=days), end, df)
+
+    @classmethod
+    def fiscal_year(cls, year: int, df: pd.DataFrame, start_month: int = 10) -> "Span":
+        """Fiscal year named after the calendar year it ends in"""
+        first = date(year - 1 if start_month > 1 else year, start_month, 1)
+        return cls(first, date(first.year + 1, start_month, 1), df)
+
+    @classmethod
+    def quarter(cls, year: int, quarter: int, df: pd.DataFrame) -> "Span":
+        """Calendar quarter, 1 to 4"""
+        first = date(year, 3 * quarter - 2, 1)
+        return cls(first, next_month(next_month(next_month(first))), df)
+
+    @classmethod
+    def iso_week(cls, year: int, week: int, df: pd.DataFrame) -> "Span":
+        """ISO 8601 week, Monday to Sunday"""
+        monday = date.fromisocalendar(year, week, 1)
+        return cls(monday, monday + timedelta(days=7), df)
+
+    def periods(self, freq: str = "month") -> Periods:
+        """Split into consecutive child spans at freq boundaries, built lazily"""
+        freq = GRANULARITIES.get(freq, freq)
+        firsts = [self.first] + [
+            anchor.date()
+            for anchor in pd.date_range(self.first, self.end, freq=freq, inclusive="neither")
+        ]
+        ends = firsts[1:] + [self.end]
+        return Periods(
+            list(zip(firsts, ends)),
+            lambda span: Span(*span, self._frame, bounds=self._span_bounds),
+        )
+
+
+def next_month(first: date) -> date:
+    """First day of the following month"""
+    return date(first.year + first.month // 12, first.month % 12 + 1, 1)
+
+
+def sort_by_date(df: pd.DataFrame) -> pd.DataFrame:
+    """Transactions in date order, only sorting if they aren't already"""
+    column = date_column(df)
+    if df[column].is_monotonic_increasing:
+        return df
+    return df.sort_values(column, kind="stable")
+
+
+def read_csv(name: str, columns: list[str] | None = None, lean: bool = False) -> pd.DataFrame:
     """
     Reads csv, cleans dates, recategorizes, removes internal transfers
-
+    Cleaned transactions are cached, so this only parses the csv the first time
 
     Args:
         str name: name of csv to read
+        list columns: only load these columns
+        bool lean: return the lean frame, int32 Day numbers and int64 Cents instead of Date and Amount
     Returns:
         DataFrame with usable dates
     """
-    df = pd.read_csv(os.path.join(".\\Analyze_Finances", "Assets", name))
-
-    # clean dates
-    df["Date"] = pd.to_datetime(df["Date"])
-
-    # recategorize
-    df["Category"] = df["Description"].apply(lambda x: recategorize(x))
+    return load_transactions(ASSETS_DIR / name, columns, lean_frame=lean)
 
-    # remove internal transfers
-    df = df[df["Category"] != "Internal Transfer"]
 
-    return df
-
-
-def recategorize(x) -> pd.DataFrame:
-    """Helper function, matches transactions up to user category mappings"""
-    for key in category_mappings.keys():
-        if x in category_mappings[key]:
-            return key
+def recategorize(x) -> str | None:
+    """Helper function, matches a single transaction up to user category mappings"""
+    return mappings_categorizer().get(x)
 
 
 def main():
     """Runtime function"""
+    parser = argparse.ArgumentParser(description="Analyze your finances")
+    parser.add_argument("--report", type=Path, help="write per-stage timings as json")
+    parser.add_argument("--profile", type=Path, help="with --report, also dump cProfile stats")
+    parser.add_argument("--trace-memory", action="store_true", help="with --report, record peak memory")
+    args = parser.parse_args()
+
     generate_mappings()
-    df = read_csv("test.csv")
-    tt = Year(2022, df)
-    tt.visualize(just_costs=True)
-    may = tt.months[5]
-    may.visualize()
+    with run_report(args.report, args.profile, args.trace_memory):
+        df = read_csv("test.csv", lean=True)
+        tt = Year(2022, df)
+        tt.visualize(just_costs=True)
+        may = tt.months[5]
+        may.visualize()
 
 
 if __name__ == "__main__":
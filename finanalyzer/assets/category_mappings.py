@@ -1,23 +0,0 @@
-category_mappings = {
-    # required categories for script
-    "Income": [],
-    "Internal Transfer": [],
-    # some suggested categories to get started
-    "Bills & Utilities": [],
-    "Car": [],
-    "Cash": [],
-    "Category Pending": [],
-    "Credit Card Payment": [],
-    "Education": [],
-    "Entertainment": [],
-    "External Transfer": [],
-    "Food & Dining": [],
-    "Gaming": [],
-    "Gas": [],
-    "Groceries": [],
-    "Home": [],
-    "Parking and Transportation": [],
-    "Personal Care": [],
-    "Pets": [],
-    "Shopping": [],
-}
@@ -0,0 +1,5 @@
+category_rules = {
+    # rules are "kind:pattern" strings matched against the Original Description
+    # kinds are prefix, token and regex, see finanalyzer/matching.py
+    # e.g. "Entertainment": ["prefix:HLU*HULU", "token:PLAYSTATION NETWORK"],
+}
@@ -1,11 +1,34 @@
-DROP TABLE IF EXISTS transaction;
-CREATE TABLE transaction (
+CREATE TABLE IF NOT EXISTS "transaction" (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fingerprint INTEGER UNIQUE,
     date TEXT NOT NULL,
     description TEXT,
     original_description TEXT,
     category TEXT,
     original_category TEXT,
     amount REAL NOT NULL,
-    status TEXT,
-);
\ No newline at end of file
+    status TEXT
+);
+
+CREATE INDEX IF NOT EXISTS transaction_date ON "transaction" (date);
+CREATE INDEX IF NOT EXISTS transaction_category_date ON "transaction" (category, date);
+CREATE INDEX IF NOT EXISTS transaction_original_description ON "transaction" (original_description);
+
+-- bumped whenever transactions change, anything cached from the store is keyed on it
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+
+-- per day and category totals, refreshed for the affected days whenever transactions change
+-- internal transfers are stored in "transaction" but left out of the totals
+CREATE TABLE IF NOT EXISTS daily_totals (
+    date TEXT NOT NULL,
+    category TEXT,
+    amount REAL NOT NULL,
+    count INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS daily_totals_date ON daily_totals (date);
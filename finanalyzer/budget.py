@@ -0,0 +1,229 @@
+"""
+Budget
+======
+Monthly per-category budgets, checked as transactions come in
+
+BudgetTracker keeps a running total per (month, category) in integer cents. Adding a
+transaction updates one entry and compares it with that category's budget, so checking
+budgets costs the same however long the history is, nothing is re-aggregated.
+Crossing a threshold (80% and 100% of the budget by default) calls the alert hook
+once per month, category and threshold, which logs a warning unless given another hook.
+
+Budgets are monthly dollar limits by category, stored as JSON in assets/budgets.json
+
+Command line:
+    python -m finanalyzer.budget set Groceries 400
+    python -m finanalyzer.budget status 2024-05
+"""
+
+import argparse
+import json
+import logging
+from collections.abc import Callable
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from .aggregate import amount_cents, date_column, to_dates
+from .files import ASSETS_DIR, replace_atomic
+from .ingest import Ledger
+
+logger = logging.getLogger(__name__)
+
+BUDGETS_PATH = ASSETS_DIR / "budgets.json"
+# shares of a budget that fire an alert when spending reaches them
+THRESHOLDS = (0.8, 1.0)
+
+
+class Alert:
+    """Spending in a category reached a threshold of its monthly budget"""
+
+    month: date
+    category: str
+    spent: float
+    budget: float
+    threshold: float
+
+    def __init__(self, month: date, category: str, spent: float, budget: float, threshold: float) -> None:
+        self.month = month
+        self.category = category
+        self.spent = spent
+        self.budget = budget
+        self.threshold = threshold
+
+    def __str__(self) -> str:
+        return (
+            f"{self.category} spending for {self.month:%B %Y} reached {self.threshold:.0%} "
+            f"of its ${self.budget:,.2f} budget, ${self.spent:,.2f} spent"
+        )
+
+
+def log_alert(alert: Alert) -> None:
+    """Default alert hook"""
+    logger.warning("%s", alert)
+
+
+class BudgetTracker:
+    """Running month by category totals, checked against budgets as they change"""
+
+    __budgets: dict[str, int]
+    __thresholds: tuple[float, ...]
+    __alert: Callable[[Alert], None]
+    __totals: dict[tuple[date, str], int]
+    __fired: set[tuple[date, str, float]]
+
+    def __init__(
+        self,
+        budgets: dict[str, float],
+        thresholds: tuple[float, ...] = THRESHOLDS,
+        alert: Callable[[Alert], None] = log_alert,
+    ) -> None:
+        """
+        Args:
+            dict budgets: category -> monthly limit in dollars
+            tuple thresholds: shares of a budget that fire an alert
+            Callable alert: called with an Alert for every threshold crossed
+        """
+        self.__budgets = {category: round(limit * 100) for category, limit in budgets.items()}
+        self.__thresholds = tuple(sorted(thresholds))
+        self.__alert = alert
+        self.__totals = {}
+        self.__fired = set()
+
+    def seed(self, totals: pd.DataFrame) -> None:
+        """
+        Replace the running totals without alerting, e.g. from Ledger.aggregates()
+        Thresholds already crossed won't alert again
+
+        Args:
+            DataFrame totals: indexed by (Month, Category) with a Cents column
+        """
+        self.__totals = {
+            (_month(month), category): int(cents)
+            for (month, category), cents in totals["Cents"].items()
+        }
+        self.__fired = set()
+        for (month, category), cents in self.__totals.items():
+            for threshold in self.__crossed(category, cents):
+                self.__fired.add((month, category, threshold))
+
+    def add(self, month: date, category: str, cents: int) -> list[Alert]:
+        """Add transactions' amount (negative for spending) to a month and category, in O(1)"""
+        month = _month(month)
+        key = (month, category)
+        total = self.__totals.get(key, 0) + cents
+        self.__totals[key] = total
+
+        alerts = []
+        for threshold in self.__crossed(category, total):
+            if (month, category, threshold) in self.__fired:
+                continue
+            self.__fired.add((month, category, threshold))
+            alert = Alert(month, category, -total / 100, self.__budgets[category] / 100, threshold)
+            self.__alert(alert)
+            alerts.append(alert)
+        return alerts
+
+    def add_transactions(self, df: pd.DataFrame) -> list[Alert]:
+        """
+        Add new cleaned transactions, regular or lean
+
+        The batch is summed per month and category first, so each
+        (month, category) it touches is only updated and checked once
+
+        Returns:
+            list of the alerts fired
+        """
+        dates = df["Date"] if date_column(df) == "Date" else to_dates(df["Day"])
+        months = dates.to_numpy().astype("datetime64[M]")
+        delta = amount_cents(df).groupby([months, df["Category"].astype(object).to_numpy()]).sum()
+        alerts = []
+        for (month, category), cents in delta.items():
+            alerts.extend(self.add(month, category, int(cents)))
+        return alerts
+
+    def spent(self, month: date, category: str) -> float:
+        """Net spending in a month and category, in dollars"""
+        return -self.__totals.get((_month(month), category), 0) / 100
+
+    def status(self, month: date) -> pd.DataFrame:
+        """Every budget's standing for a month, see budget_status"""
+        month = _month(month)
+        spent = pd.Series(
+            {category: self.spent(month, category) for category in self.__budgets}, dtype=float
+        )
+        return budget_status({category: cents / 100 for category, cents in self.__budgets.items()}, spent)
+
+    def __crossed(self, category: str, total: int) -> list[float]:
+        """Thresholds of the category's budget that a running total has reached"""
+        budget = self.__budgets.get(category)
+        if budget is None:
+            return []
+        return [threshold for threshold in self.__thresholds if -total >= threshold * budget]
+
+
+def budget_status(budgets: dict[str, float], spent: pd.Series) -> pd.DataFrame:
+    """
+    Budgets against spending
+
+    Args:
+        dict budgets: category -> monthly limit in dollars
+        Series spent: net spending in dollars by category
+    Returns:
+        DataFrame indexed by Category with Budget, Spent, Remaining and Used (share of the budget)
+    """
+    status = pd.DataFrame({"Budget": pd.Series(budgets, dtype=float)})
+    status.index.name = "Category"
+    status["Spent"] = spent.reindex(status.index, fill_value=0.0).to_numpy()
+    status["Remaining"] = status["Budget"] - status["Spent"]
+    status["Used"] = status["Spent"] / status["Budget"]
+    return status
+
+
+def load_budgets(path: Path = BUDGETS_PATH) -> dict[str, float]:
+    """The user's monthly budgets, category -> dollars, none if never saved"""
+    if not Path(path).exists():
+        return {}
+    return json.loads(Path(path).read_text(encoding="UTF-8"))["budgets"]
+
+
+def save_budgets(budgets: dict[str, float], path: Path = BUDGETS_PATH) -> None:
+    """Atomically replace the saved budgets"""
+    payload = {"format": 1, "budgets": budgets}
+    replace_atomic(
+        Path(path), lambda temp: temp.write_text(json.dumps(payload, indent=0), encoding="UTF-8")
+    )
+
+
+def _month(value) -> date:
+    """First day of the month of a date, Timestamp, datetime64 or "YYYY-MM" string"""
+    return pd.Timestamp(value).date().replace(day=1)
+
+
+def main():
+    """Runtime function"""
+    parser = argparse.ArgumentParser(description="Monthly category budgets")
+    commands = parser.add_subparsers(dest="command", required=True)
+    budget = commands.add_parser("set", help="set a category's monthly budget, 0 removes it")
+    budget.add_argument("category")
+    budget.add_argument("amount", type=float)
+    status = commands.add_parser("status", help="budgets against the ingested transactions")
+    status.add_argument("month", nargs="?", default=date.today().strftime("%Y-%m"))
+    args = parser.parse_args()
+
+    budgets = load_budgets()
+    if args.command == "set":
+        if args.amount:
+            budgets[args.category] = args.amount
+        else:
+            budgets.pop(args.category, None)
+        save_budgets(budgets)
+    else:
+        tracker = BudgetTracker(budgets, alert=lambda _: None)
+        tracker.seed(Ledger().aggregates())
+        print(tracker.status(args.month).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Cache
+=====
+Columnar cache of cleaned, categorized transactions
+
+Every bank export is parsed, cleaned and categorized once and then written to
+a Parquet file keyed by the export's content hash and the version of the
+category mappings, so later runs only read the columns they need. Internal
+transfers are cached too and only dropped on load, unless asked for. Writing a new
+version removes the export's older ones, and a cache file that can't be read is
+rebuilt from the CSV. Parquet needs pyarrow (poetry install -E cache), without it
+every load falls back on parsing the CSV.
+"""
+
+from pathlib import Path
+
+import pandas as pd
+
+from .categorizer import Categorizer
+from .files import ASSETS_DIR, file_digest, replace_atomic
+from .instrument import stage
+from .transactions import (
+    clean_transactions,
+    compact,
+    expand,
+    lean,
+    mappings_version,
+    stored_columns,
+    with_category,
+    without_transfers,
+)
+
+CACHE_DIR = ASSETS_DIR / ".cache"
+# bumped whenever what a cache file holds changes, 2: internal transfers are kept
+CACHE_FORMAT = 2
+
+
+def cache_path(path: str | Path, cache_dir: Path = CACHE_DIR, categorizer: Categorizer | None = None) -> Path:
+    """Where the cleaned version of this export, categorized with categorizer, is cached"""
+    return cache_dir / f"{file_digest(path)}-{mappings_version(categorizer)}-v{CACHE_FORMAT}.parquet"
+
+
+def load_transactions(
+    path: str | Path,
+    columns: list[str] | None = None,
+    cache_dir: Path = CACHE_DIR,
+    lean_frame: bool = False,
+    transfers: bool = False,
+    categorizer: Categorizer | None = None,
+) -> pd.DataFrame:
+    """
+    Cleaned transactions of a bank export, from the cache when possible
+
+    Args:
+        str path: bank export csv
+        list columns: only load these columns, Amount is rebuilt from the cached Cents
+        Path cache_dir: cache directory
+        bool lean_frame: return the lean frame (Day, Cents, categoricals), see transactions.lean
+        bool transfers: keep internal transfers
+        Categorizer categorizer: compiled mappings, defaults to the user's category mappings
+    Returns:
+        DataFrame of cleaned transactions with compact dtypes
+    """
+    cached = cache_path(path, cache_dir, categorizer)
+    stored = stored_columns(columns)
+    read = stored if transfers else with_category(stored)
+
+    def finish(df: pd.DataFrame) -> pd.DataFrame:
+        if not transfers:
+            df = without_transfers(df, stored)
+        elif stored is not None:
+            df = df[stored]
+        return lean(df) if lean_frame else expand(df)
+
+    if cached.exists():
+        try:
+            with stage("cache_read") as timed:
+                df = finish(pd.read_parquet(cached, columns=read))
+                timed.rows = len(df)
+            return df
+        except ImportError:
+            pass
+        except (OSError, ValueError):
+            # truncated or corrupt, e.g. another tool crashed mid-write, pyarrow's errors subclass these
+            cached.unlink(missing_ok=True)
+
+    with stage("parse") as timed:
+        df = pd.read_csv(path)
+        timed.rows = len(df)
+    df = compact(clean_transactions(df, categorizer, transfers=True))
+    try:
+        with stage("cache_write") as timed:
+            write_atomic(df, cached)
+            timed.rows = len(df)
+        prune(cached)
+    except ImportError:
+        # no parquet engine, cache is best effort
+        pass
+    return finish(df)
+
+
+def prune(cached: Path) -> None:
+    """Remove the versions of a cached export superseded by this one"""
+    digest = cached.name.split("-", 1)[0]
+    for path in cached.parent.glob(f"{digest}-*.parquet"):
+        if path != cached:
+            path.unlink(missing_ok=True)
+
+
+def write_atomic(df: pd.DataFrame, path: Path) -> None:
+    """Write a frame to parquet atomically"""
+    replace_atomic(path, lambda temp: df.to_parquet(temp, index=False))
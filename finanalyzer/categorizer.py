@@ -0,0 +1,107 @@
+"""
+Categorizer
+===========
+Compiled lookup of transaction descriptions to user categories
+
+The category mappings are stored as category -> list of descriptions,
+which is convenient to edit but means every lookup has to scan every list.
+The Categorizer inverts that once into a description -> category hash index,
+so a whole Description column can be categorized in a single Series.map pass.
+"""
+
+import hashlib
+import json
+
+import pandas as pd
+
+
+class Categorizer:
+    """Description -> category index built from a category mapping"""
+
+    __index: dict[str, str]
+    __shape: tuple[tuple[str, tuple[str, ...]], ...] | None
+    __version: str | None
+
+    def __init__(self, mapping: dict[str, list[str]]) -> None:
+        self.__index = {}
+        for category, descriptions in mapping.items():
+            for description in descriptions:
+                # first category listed wins, same as the old linear scan
+                self.__index.setdefault(description, category)
+        self.__shape = mapping_shape(mapping)
+        self.__version = None
+
+    @classmethod
+    def from_index(cls, index: dict[str, str]) -> "Categorizer":
+        """Wrap an index that was already built, e.g. loaded from disk"""
+        categorizer = cls({})
+        categorizer.__index = index
+        categorizer.__shape = None
+        return categorizer
+
+    def __contains__(self, description: str) -> bool:
+        return description in self.__index
+
+    def __len__(self) -> int:
+        return len(self.__index)
+
+    @property
+    def index(self) -> dict[str, str]:
+        """The description -> category lookup table"""
+        return self.__index
+
+    @property
+    def version(self) -> str:
+        """Content hash of the index, stable across runs"""
+        if self.__version is None:
+            payload = json.dumps(self.__index, sort_keys=True).encode("utf-8")
+            self.__version = hashlib.sha256(payload).hexdigest()[:16]
+        return self.__version
+
+    def is_current(self, mapping: dict[str, list[str]]) -> bool:
+        """Check whether the mapping has changed since this index was built"""
+        return mapping_shape(mapping) == self.__shape
+
+    def get(self, description: str) -> str | None:
+        """Category for a single description, None if it isn't mapped"""
+        return self.__index.get(description)
+
+    def categorize(self, descriptions: pd.Series) -> pd.Series:
+        """
+        Categorize a whole column of descriptions in one vectorized pass
+
+        Args:
+            pd.Series descriptions: Description column
+        Returns:
+            Series of categories, NaN where the description isn't mapped
+        """
+        return descriptions.map(self.__index)
+
+
+def mapping_shape(mapping: dict[str, list[str]]) -> tuple[tuple[str, tuple[str, ...]], ...]:
+    """
+    Snapshot of a mapping's content, differs whenever a description is added, removed,
+    renamed or moved, even when every list keeps its length
+
+    Copying references and comparing tuples is much cheaper than rebuilding the index
+    """
+    return tuple((category, tuple(descriptions)) for category, descriptions in mapping.items())
+
+
+def mapping_version(mapping: dict[str, list[str]]) -> str:
+    """Content hash of a mapping, stable across runs"""
+    payload = json.dumps(mapping, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+# keyed by id, the mapping is kept alongside so the id can't be reused
+_compiled: dict[int, tuple[dict[str, list[str]], Categorizer]] = {}
+
+
+def get_categorizer(mapping: dict[str, list[str]]) -> Categorizer:
+    """Return the compiled index for a mapping, only rebuilding it when the mapping changes"""
+    _, categorizer = _compiled.get(id(mapping), (None, None))
+    if categorizer is None or not categorizer.is_current(mapping):
+        categorizer = Categorizer(mapping)
+        _compiled[id(mapping)] = (mapping, categorizer)
+    return categorizer
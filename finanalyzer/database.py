@@ -0,0 +1,287 @@
+"""
+Database
+========
+SQLite transaction store, see assets/transaction_schema.sql
+
+Transactions are loaded in bulk inside a single transaction and deduplicated on
+their fingerprint. Per day and category totals are materialized in daily_totals and
+refreshed for just the loaded days, and every period/category total is rolled up
+from that table, so answering "spend per category in May" never reads raw transactions.
+Internal transfers are stored, so recategorizing can turn them back into spending,
+but are left out of daily_totals and so of every total.
+
+Command line:
+    python -m finanalyzer.database load export.csv
+    python -m finanalyzer.database totals 2022-05-01 2022-06-01
+    python -m finanalyzer.database recategorize
+"""
+
+import argparse
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from .cache import load_transactions
+from .categorizer import Categorizer
+from .files import ASSETS_DIR
+from .ingest import fingerprint
+from .instrument import stage
+from .matching import MerchantMatcher
+from .transactions import TRANSFER, categorize, compact
+
+DATABASE_PATH = ASSETS_DIR / "transactions.sqlite"
+# what totals call transactions with no category, neither mapped nor matched by a rule
+UNCATEGORIZED = "Uncategorized"
+
+# SQL expression for the first day (or label) of the period each date falls in
+PERIODS = {
+    "day": "date",
+    "week": "date(date, '-6 days', 'weekday 1')",
+    "month": "strftime('%Y-%m-01', date)",
+    "quarter": "printf('%s-%02d-01', strftime('%Y', date), (strftime('%m', date) - 1) / 3 * 3 + 1)",
+    "year": "strftime('%Y-01-01', date)",
+}
+
+
+class TransactionStore:
+    """SQLite backed store of cleaned transactions"""
+
+    __connection: sqlite3.Connection
+
+    def __init__(self, path: str | Path = DATABASE_PATH) -> None:
+        Path(path).parent.mkdir(exist_ok=True, parents=True)
+        # generous busy timeout, several processes may be loading at once
+        self.__connection = sqlite3.connect(path, timeout=30.0)
+        self.__connection.row_factory = sqlite3.Row
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("PRAGMA synchronous=NORMAL")
+        with open(ASSETS_DIR / "transaction_schema.sql", "r", encoding="UTF-8") as schema:
+            self.__connection.executescript(schema.read())
+        if not self.__connection.execute("SELECT EXISTS(SELECT 1 FROM daily_totals)").fetchone()[0]:
+            # stores created before daily_totals existed
+            with self.__connection:
+                self.refresh_totals()
+        with self.__connection:
+            # stores whose totals were refreshed while transfers were still counted
+            if self.__connection.execute("DELETE FROM daily_totals WHERE category = ?", (TRANSFER,)).rowcount:
+                self.__bump_version()
+
+    def __enter__(self) -> "TransactionStore":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.__connection.execute('SELECT COUNT(*) FROM "transaction"').fetchone()[0]
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        return self.__connection
+
+    @property
+    def version(self) -> int:
+        """Data version, changes whenever transactions are added"""
+        return self.__connection.execute(
+            "SELECT value FROM meta WHERE key = 'version'"
+        ).fetchone()[0]
+
+    def close(self) -> None:
+        self.__connection.close()
+
+    def load(self, df: pd.DataFrame) -> int:
+        """
+        Bulk load cleaned transactions, skipping any already in the store
+
+        Args:
+            DataFrame df: cleaned transactions, internal transfers included
+        Returns:
+            number of transactions inserted
+        """
+        if df.empty:
+            return 0
+        df = compact(df)
+        rows = pd.DataFrame(
+            {
+                # sqlite integers are signed
+                "fingerprint": fingerprint(df).to_numpy().view("int64"),
+                "date": df["Date"].dt.strftime("%Y-%m-%d"),
+                "description": df["Description"],
+                "original_description": df["Original Description"],
+                "category": df["Category"],
+                "original_category": df.get("Original Category"),
+                "amount": df["Cents"] / 100,
+                "status": df["Status"],
+            }
+        )
+        rows = rows.astype(object).where(rows.notna(), None)
+
+        before = self.__connection.total_changes
+        with stage("load") as timed, self.__connection:
+            timed.rows = len(rows)
+            self.__connection.executemany(
+                'INSERT OR IGNORE INTO "transaction" '
+                "(fingerprint, date, description, original_description, "
+                "category, original_category, amount, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows.itertuples(index=False, name=None),
+            )
+            inserted = self.__connection.total_changes - before
+            if inserted:
+                self.refresh_totals(
+                    df["Date"].min().date(), df["Date"].max().date() + timedelta(days=1)
+                )
+                self.__bump_version()
+        return inserted
+
+    def load_file(self, path: str | Path) -> int:
+        """Bulk load a bank export, returns the number of transactions inserted"""
+        return self.load(load_transactions(path, transfers=True))
+
+    def recategorize(
+        self, categorizer: Categorizer | None = None, matcher: MerchantMatcher | None = None
+    ) -> int:
+        """
+        Recategorize every stored transaction and rebuild the totals, in one transaction
+
+        Each distinct description is categorized once, however many transactions share it
+
+        Args:
+            Categorizer categorizer: compiled mappings, defaults to the user's category mappings
+            MerchantMatcher matcher: compiled rules, defaults to the user's category rules
+        Returns:
+            number of transactions whose category changed
+        """
+        descriptions = pd.read_sql_query(
+            'SELECT DISTINCT description AS Description, original_description AS "Original Description" '
+            'FROM "transaction"',
+            self.__connection,
+        )
+        categories = categorize(descriptions, categorizer, matcher)
+        rows = pd.DataFrame(
+            {
+                "category": categories,
+                "description": descriptions["Description"],
+                "original_description": descriptions["Original Description"],
+            }
+        )
+        rows = rows.astype(object).where(rows.notna(), None)
+
+        before = self.__connection.total_changes
+        with self.__connection:
+            self.__connection.executemany(
+                'UPDATE "transaction" SET category = ?1 '
+                "WHERE description IS ?2 AND original_description IS ?3 AND category IS NOT ?1",
+                rows.itertuples(index=False, name=None),
+            )
+            changed = self.__connection.total_changes - before
+            if changed:
+                self.refresh_totals()
+                self.__bump_version()
+        return changed
+
+    def refresh_totals(self, first: date | None = None, end: date | None = None) -> None:
+        """
+        Recompute daily_totals from the transactions from first up to (not including) end,
+        internal transfers aside
+        Runs inside the caller's transaction, so readers never see a half refreshed table
+        """
+        where, params = _date_range(first, end)
+        self.__connection.execute(f"DELETE FROM daily_totals{where}", params)
+        spending = f"{where} AND" if where else " WHERE"
+        self.__connection.execute(
+            "INSERT INTO daily_totals (date, category, amount, count) "
+            f'SELECT date, category, SUM(amount), COUNT(*) FROM "transaction"{spending} category IS NOT ? '
+            "GROUP BY date, category",
+            [*params, TRANSFER],
+        )
+
+    def category_totals(self, first: date | None = None, end: date | None = None) -> pd.DataFrame:
+        """
+        Per-category totals from first up to (not including) end
+
+        Returns:
+            DataFrame indexed by Category with Sum and Count columns, see UNCATEGORIZED
+        """
+        where, params = _date_range(first, end)
+        with stage("sql"):
+            return pd.read_sql_query(
+                "SELECT COALESCE(category, ?1) AS Category, SUM(amount) AS Sum, SUM(count) AS Count "
+                f"FROM daily_totals{where} GROUP BY COALESCE(category, ?1) ORDER BY 1",
+                self.__connection,
+                params=[UNCATEGORIZED, *params],
+                index_col="Category",
+            )
+
+    def period_totals(
+        self, granularity: str = "month", first: date | None = None, end: date | None = None
+    ) -> pd.DataFrame:
+        """
+        Period by category totals, rows are periods labelled by their first day
+
+        Args:
+            str granularity: one of PERIODS
+            date first: optional first day
+            date end: optional day after the last
+        Returns:
+            DataFrame of summed amounts, one column per category, see UNCATEGORIZED
+        """
+        period = PERIODS[granularity]
+        where, params = _date_range(first, end)
+        with stage("sql"):
+            totals = pd.read_sql_query(
+                f"SELECT {period} AS Period, COALESCE(category, ?1) AS Category, SUM(amount) AS Sum "
+                f"FROM daily_totals{where} GROUP BY Period, COALESCE(category, ?1)",
+                self.__connection,
+                params=[UNCATEGORIZED, *params],
+                parse_dates=["Period"],
+            )
+        return totals.pivot_table(
+            index="Period", columns="Category", values="Sum", aggfunc="sum", fill_value=0.0
+        )
+
+    def __bump_version(self) -> None:
+        self.__connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+
+
+def _date_range(first: date | None, end: date | None) -> tuple[str, list[str]]:
+    """WHERE clause on the date index"""
+    clauses, params = [], []
+    if first is not None:
+        clauses.append("date >= ?")
+        params.append(first.isoformat())
+    if end is not None:
+        clauses.append("date < ?")
+        params.append(end.isoformat())
+    if not clauses:
+        return "", params
+    return " WHERE " + " AND ".join(clauses), params
+
+
+def main():
+    """Runtime function"""
+    parser = argparse.ArgumentParser(description="finanalyzer transaction store")
+    parser.add_argument("--database", default=DATABASE_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("load", help="load bank exports into the store")
+    load.add_argument("csv", nargs="+")
+    totals = commands.add_parser("totals", help="per-category totals for a date range")
+    totals.add_argument("first", type=date.fromisoformat)
+    totals.add_argument("end", type=date.fromisoformat)
+    commands.add_parser("recategorize", help="recategorize every transaction with the current mappings")
+    args = parser.parse_args()
+
+    with TransactionStore(args.database) as store:
+        if args.command == "load":
+            for csv in args.csv:
+                print(f"{csv}: {store.load_file(csv)} new transactions")
+        elif args.command == "recategorize":
+            print(f"{store.recategorize()} transactions recategorized")
+        else:
+            print(store.category_totals(args.first, args.end).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Files
+=====
+Asset locations and safe file writes shared across finanalyzer
+"""
+
+import hashlib
+import os
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+ASSETS_DIR = Path(__file__).parent / "assets"
+
+
+def file_digest(path: str | Path) -> str:
+    """Content hash of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as infile:
+        for block in iter(lambda: infile.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def replace_atomic(path: Path, write: Callable[[Path], None]) -> None:
+    """Write to a temp file then rename, so readers never see a half written file"""
+    path.parent.mkdir(exist_ok=True, parents=True)
+    temp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        write(temp)
+        os.replace(temp, path)
+    finally:
+        temp.unlink(missing_ok=True)
@@ -1,8 +1,17 @@
+import argparse
+import difflib
+import json
 import os
+from pathlib import Path
 
 import pandas as pd
 
-from .assets.category_mappings import category_mappings
+from .assets.category_rules import category_rules
+from .cache import CACHE_DIR
+from .categorizer import Categorizer, get_categorizer
+from .files import ASSETS_DIR, file_digest, replace_atomic
+from .mappings import MAPPINGS_PATH, load_mappings, save_mappings
+from .matching import get_matcher
 
 
 def fill_dict(working_dict: dict[str, list[str]], in_csv: str) -> dict[str, list[str]]:
@@ -18,12 +27,18 @@ def fill_dict(working_dict: dict[str, list[str]], in_csv: str) -> dict[str, list
 
     working_dict = sort_dict(working_dict)
 
+    # categories the merchant rules can already work out, no need to ask for those
+    originals = df.drop_duplicates("Description").set_index("Description")
+    matched = get_matcher(category_rules).match(originals["Original Description"])
+
     # check the mapping dict for each description in the csv
+    mapped = Categorizer(working_dict)
     for description in df["Description"].unique():
-        found = False
-        for key in working_dict.keys():
-            if description in working_dict[key]:
-                found = True
+        found = description in mapped
+        # matched by a rule, file it under that category
+        if not found and pd.notna(matched[description]):
+            working_dict.setdefault(matched[description], []).append(description)
+            found = True
         # not in the mapping dict, get user input
         if not found:
             # print currrent available categories
@@ -75,7 +90,9 @@ def fill_dict(working_dict: dict[str, list[str]], in_csv: str) -> dict[str, list
                     else:
                         # try again on the next run, this one's getting skipped
                         print("Error, skipping...")
-            working_dict = sort_dict(working_dict)
+            # only a new category changes the order
+            if list(working_dict) != sorted(working_dict):
+                working_dict = sort_dict(working_dict)
     return working_dict
 
 
@@ -88,28 +105,178 @@ def sort_dict(in_dict: dict[str, list[str]]) -> dict[str, list[str]]:
     return out_dict
 
 
-def write_dict(in_dict: dict[str, list[str]], outpath: str) -> None:
-    """Takes dictionary and path input, writes dictionary to file at path"""
-    with open(outpath, "w") as outfile:
-        in_dict = sort_dict(in_dict)
+def write_dict(in_dict: dict[str, list[str]], outpath: str | Path = MAPPINGS_PATH) -> int:
+    """Takes dictionary and path input, atomically saves dictionary to file at path, returns its version"""
+    in_dict = sort_dict(in_dict)
+
+    # only take the keys that have data in them
+    out_dict = {}
+    for key in list(in_dict.keys()):
+        if in_dict[key]:
+            out_dict[key] = in_dict[key]
+
+    return save_mappings(out_dict, Path(outpath))
+
+
+def unmapped_descriptions(
+    working_dict: dict[str, list[str]], df: pd.DataFrame
+) -> pd.DataFrame:
+    """Transactions whose description has no category, found in one vectorized pass"""
+    return df[~df["Description"].isin(pd.Index(Categorizer(working_dict).index))]
+
+
+def suggest_categories(working_dict: dict[str, list[str]], df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Suggests a category for every unmapped description
+
+    In order of preference the suggestion comes from a merchant rule,
+    the most similar description that is already mapped, or the bank's own category
+
+    Args:
+        dict working_dict: category mappings
+        DataFrame df: raw bank export(s)
+    Returns:
+        DataFrame with a row per unmapped description and
+        Original Description, Bank Category, Category and Source columns
+    """
+    unmapped = unmapped_descriptions(working_dict, df)
+
+    # the bank's most common category for each description
+    bank = (
+        unmapped.groupby(["Description", "Category"], dropna=False)
+        .size()
+        .sort_values(ascending=False, kind="stable")
+        .reset_index()
+        .drop_duplicates("Description")
+        .set_index("Description")["Category"]
+    )
+    review = pd.DataFrame(
+        {
+            "Original Description": unmapped.drop_duplicates("Description").set_index("Description")[
+                "Original Description"
+            ],
+            "Bank Category": bank,
+        }
+    ).sort_index()
+    review.index.name = "Description"
+
+    rule = get_matcher(category_rules).match(review["Original Description"])
+    nearest = _similar_merchant(working_dict)
+    similar = pd.DataFrame(
+        [nearest(description) for description in review.index],
+        index=review.index,
+        columns=["Merchant", "Category"],
+    )
+    review["Category"] = rule.fillna(similar["Category"]).fillna(review["Bank Category"])
+    review["Source"] = "bank"
+    review.loc[similar["Category"].notna(), "Source"] = "similar to " + similar["Merchant"]
+    review.loc[rule.notna(), "Source"] = "rule"
+    return review.reset_index()
+
+
+def _similar_merchant(working_dict: dict[str, list[str]]):
+    """Returns a lookup of the closest mapped description and its category"""
+    categorizer = Categorizer(working_dict)
+
+    # only compare against descriptions sharing the first word, not every mapped merchant
+    by_word: dict[str, list[str]] = {}
+    for known in categorizer.index:
+        by_word.setdefault(known.split(" ")[0].lower(), []).append(known)
 
-        # only take the keys that have data in them
-        out_dict = {}
-        for key in list(in_dict.keys()):
-            if in_dict[key]:
-                out_dict[key] = in_dict[key]
+    def lookup(description) -> tuple[str | None, str | None]:
+        candidates = by_word.get(str(description).split(" ")[0].lower(), [])
+        close = difflib.get_close_matches(str(description), candidates, n=1, cutoff=0.8)
+        if not close:
+            return None, None
+        return close[0], categorizer.get(close[0])
 
-        # formatting
-        out_dict = str(out_dict).replace("], ", "],\n    ")
+    return lookup
 
-        outfile.write(f"category_mappings = {out_dict}")
+
+def write_review(working_dict: dict[str, list[str]], in_csvs: list[str], outpath: str) -> int:
+    """
+    Writes every unmapped description in the csvs with a suggested category to a review file
+
+    Edit the Category column, leave it blank to skip a description, then use apply_review
+    Returns:
+        number of descriptions to review
+    """
+    df = pd.concat(
+        [
+            pd.read_csv(in_csv, usecols=["Description", "Original Description", "Category"])
+            for in_csv in in_csvs
+        ],
+        ignore_index=True,
+    )
+    review = suggest_categories(working_dict, df)
+    review.to_csv(outpath, index=False)
+    return len(review)
+
+
+def apply_review(working_dict: dict[str, list[str]], in_csv: str) -> dict[str, list[str]]:
+    """Adds every reviewed description to its category in one bulk update"""
+    review = pd.read_csv(in_csv, usecols=["Description", "Category"]).dropna()
+    review = review[~review["Description"].isin(pd.Index(Categorizer(working_dict).index))]
+    for category, descriptions in review.groupby("Category")["Description"]:
+        working_dict.setdefault(category, []).extend(descriptions.drop_duplicates())
+    return sort_dict(working_dict)
+
+
+def fully_mapped(in_dict: dict[str, list[str]], in_csv: str) -> bool:
+    """Checks whether every description in the csv has a category"""
+    descriptions = pd.read_csv(in_csv, usecols=["Description"])["Description"].dropna()
+    return bool(descriptions.isin(get_categorizer(in_dict).index).all())
 
 
 def generate_mappings():
     """Runtime Function"""
-    working_dict = category_mappings
-    assets_dir = os.path.join(".\\Analyze_Finances", "Assets")
-    for file in os.scandir(assets_dir):
-        if file.name.endswith(".csv"):
-            working_dict = fill_dict(working_dict, os.path.join(assets_dir, file.name))
-            write_dict(working_dict, os.path.join(assets_dir, "category_mappings.py"))
+    working_dict = load_mappings()
+    assets_dir = ASSETS_DIR
+
+    # exports that were completely mapped on an earlier run don't need rescanning
+    mapped_path = CACHE_DIR / "mapped_files.json"
+    mapped = set()
+    if mapped_path.exists():
+        mapped = set(json.loads(mapped_path.read_text(encoding="UTF-8")))
+
+    # saved once at the end, even if the session is interrupted
+    try:
+        for file in os.scandir(assets_dir):
+            if file.name.endswith(".csv"):
+                in_csv = os.path.join(assets_dir, file.name)
+                digest = file_digest(in_csv)
+                if digest in mapped:
+                    continue
+                working_dict = fill_dict(working_dict, in_csv)
+                if fully_mapped(working_dict, in_csv):
+                    mapped.add(digest)
+    finally:
+        write_dict(working_dict)
+
+    replace_atomic(
+        mapped_path,
+        lambda temp: temp.write_text(json.dumps(sorted(mapped)), encoding="UTF-8"),
+    )
+
+
+def main():
+    """Runtime function"""
+    parser = argparse.ArgumentParser(description="Generate category mappings")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--review", metavar="CSV", help="write unmapped descriptions to a review file")
+    mode.add_argument("--apply", metavar="CSV", help="apply a reviewed file to the mappings")
+    args = parser.parse_args()
+
+    if args.review:
+        in_csvs = sorted(str(path) for path in ASSETS_DIR.glob("*.csv"))
+        count = write_review(load_mappings(), in_csvs, args.review)
+        print(f"{count} descriptions to review in {args.review}")
+    elif args.apply:
+        version = write_dict(apply_review(load_mappings(), args.apply))
+        print(f"Saved category mappings version {version}")
+    else:
+        generate_mappings()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Ingest
+======
+Incremental, append-only ingestion of bank exports
+
+Exports from the same account overlap heavily month to month, so every transaction
+is fingerprinted by (Date, Amount, Original Description, Status) and only rows with
+new fingerprints are appended to the ledger. Identical transactions within one export
+(two coffees on the same day) are told apart by their occurrence count, so they are
+kept while the same pair in an overlapping export is not ingested twice.
+
+The ledger is a directory of Parquet parts plus a manifest of each part's date range,
+so deduplicating a new export only reads the fingerprints of the parts it overlaps.
+Month by category totals are kept alongside and updated with just the new rows,
+as are the running totals of a BudgetTracker, if one is given. Internal transfers
+are kept in the parts, so recategorizing can move rows into or out of them, but
+are left out of the totals and of transactions() unless asked for.
+"""
+
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from .cache import CACHE_DIR, load_transactions, write_atomic
+from .files import ASSETS_DIR, file_digest, replace_atomic
+from .transactions import (
+    categorize,
+    compact,
+    expand,
+    mappings_version,
+    stored_columns,
+    with_category,
+    without_transfers,
+)
+
+if TYPE_CHECKING:
+    from .budget import BudgetTracker
+
+LEDGER_DIR = CACHE_DIR / "ledger"
+
+FINGERPRINT_COLUMNS = ["Date", "Cents", "Original Description", "Status"]
+
+
+def fingerprint(df: pd.DataFrame) -> pd.Series:
+    """
+    64 bit fingerprint of each transaction
+
+    Args:
+        DataFrame df: compacted transactions
+    Returns:
+        uint64 Series, repeats of the same transaction within df get different fingerprints
+    """
+    keys = df[FINGERPRINT_COLUMNS]
+    occurrence = keys.groupby(FINGERPRINT_COLUMNS, observed=True, dropna=False).cumcount()
+    return pd.util.hash_pandas_object(keys.assign(Occurrence=occurrence), index=False)
+
+
+class Ledger:
+    """Append-only store of every transaction ingested so far"""
+
+    __directory: Path
+    __manifest: dict
+    __budgets: "BudgetTracker | None"
+
+    def __init__(self, directory: Path = LEDGER_DIR, budgets: "BudgetTracker | None" = None) -> None:
+        """
+        Args:
+            Path directory: ledger directory
+            BudgetTracker budgets: seeded with the ledger's totals, then checked as transactions are ingested
+        """
+        self.__directory = Path(directory)
+        manifest = self.__directory / "manifest.json"
+        if manifest.exists():
+            self.__manifest = json.loads(manifest.read_text(encoding="UTF-8"))
+        else:
+            self.__manifest = {"version": mappings_version(), "parts": [], "files": []}
+        self.__budgets = budgets
+        if budgets is not None:
+            budgets.seed(self.aggregates())
+
+    def __len__(self) -> int:
+        return sum(part["rows"] for part in self.__manifest["parts"])
+
+    @property
+    def version(self) -> str:
+        """Mappings version the ledger was categorized with"""
+        return self.__manifest["version"]
+
+    @property
+    def stale(self) -> bool:
+        """True when the mappings have changed since the ledger was categorized"""
+        return self.version != mappings_version()
+
+    def has_file(self, digest: str) -> bool:
+        """True when the export with this file_digest was already ingested"""
+        return digest in self.__manifest["files"]
+
+    def add_file(self, digest: str) -> None:
+        """Record an export as ingested, by its file_digest, so it's skipped from now on"""
+        self.__manifest["files"].append(digest)
+        self.__save_manifest()
+
+    def ingest_file(self, path: str | Path) -> pd.DataFrame:
+        """Ingest a bank export, skipping it outright if this exact file was already ingested"""
+        digest = file_digest(path)
+        if self.has_file(digest):
+            return pd.DataFrame()
+        new = self.ingest(load_transactions(path, transfers=True))
+        self.add_file(digest)
+        return new
+
+    def ingest(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Append the transactions that aren't in the ledger yet
+
+        Args:
+            DataFrame df: cleaned transactions, internal transfers included
+        Returns:
+            DataFrame of the rows that were new, internal transfers included
+        """
+        if df.empty:
+            return df
+        df = compact(df)
+        df["Fingerprint"] = fingerprint(df)
+
+        known = self.__fingerprints(df["Date"].min(), df["Date"].max())
+        new = df[~df["Fingerprint"].isin(known)]
+        if new.empty:
+            return expand(new)
+
+        name = f"part-{len(self.__manifest['parts']):06d}.parquet"
+        write_atomic(new, self.__directory / name)
+        self.__manifest["parts"].append(
+            {
+                "name": name,
+                "first": new["Date"].min().isoformat(),
+                "last": new["Date"].max().isoformat(),
+                "rows": len(new),
+            }
+        )
+        self.__update_aggregates(new)
+        self.__save_manifest()
+        if self.__budgets is not None:
+            self.__budgets.add_transactions(without_transfers(new))
+        return expand(new)
+
+    def transactions(
+        self,
+        columns: list[str] | None = None,
+        first: pd.Timestamp | None = None,
+        last: pd.Timestamp | None = None,
+        transfers: bool = False,
+    ) -> pd.DataFrame:
+        """Every ingested transaction, optionally only the parts overlapping first to last and transfers"""
+        stored = stored_columns(columns)
+        read = stored if transfers else with_category(stored)
+        frames = [pd.read_parquet(path, columns=read) for path in self.__parts(first, last)]
+        if not frames:
+            return expand(pd.DataFrame(columns=stored))
+        df = pd.concat(frames, ignore_index=True)
+        if first is not None:
+            df = df[df["Date"] >= first]
+        if last is not None:
+            df = df[df["Date"] <= last]
+        if not transfers:
+            df = without_transfers(df)
+        return expand(df if stored is None else df[stored])
+
+    def aggregates(self) -> pd.DataFrame:
+        """Month by category totals, indexed by (Month, Category) with Cents and Count columns"""
+        path = self.__directory / "aggregates.parquet"
+        if not path.exists():
+            index = pd.MultiIndex.from_arrays([[], []], names=["Month", "Category"])
+            return pd.DataFrame({"Cents": [], "Count": []}, index=index, dtype="int64")
+        return pd.read_parquet(path).set_index(["Month", "Category"])
+
+    def recategorize(self) -> None:
+        """Recategorize the whole history with the current mappings and rebuild the totals"""
+        (self.__directory / "aggregates.parquet").unlink(missing_ok=True)
+        for part in self.__manifest["parts"]:
+            path = self.__directory / part["name"]
+            df = pd.read_parquet(path)
+            df["Category"] = categorize(df).astype("category")
+            write_atomic(df, path)
+            self.__update_aggregates(df)
+        self.__manifest["version"] = mappings_version()
+        self.__save_manifest()
+        if self.__budgets is not None:
+            # spending moved between categories, nothing new was spent
+            self.__budgets.seed(self.aggregates())
+
+    def __parts(self, first: pd.Timestamp | None, last: pd.Timestamp | None) -> list[Path]:
+        """Parts whose date range overlaps first to last"""
+        return [
+            self.__directory / part["name"]
+            for part in self.__manifest["parts"]
+            if (first is None or pd.Timestamp(part["last"]) >= first)
+            and (last is None or pd.Timestamp(part["first"]) <= last)
+        ]
+
+    def __fingerprints(self, first: pd.Timestamp, last: pd.Timestamp) -> np.ndarray:
+        """Fingerprints already ingested in the parts overlapping first to last"""
+        frames = [pd.read_parquet(path, columns=["Fingerprint"]) for path in self.__parts(first, last)]
+        if not frames:
+            return np.array([], dtype="uint64")
+        return np.concatenate([frame["Fingerprint"].to_numpy() for frame in frames])
+
+    def __update_aggregates(self, new: pd.DataFrame) -> None:
+        """Fold the new rows into the month by category totals, internal transfers aside"""
+        new = without_transfers(new)
+        month = new["Date"].dt.to_period("M").dt.start_time.rename("Month")
+        category = new["Category"].astype(object).rename("Category")
+        delta = new.groupby([month, category])["Cents"].agg(Cents="sum", Count="count")
+        totals = self.aggregates().add(delta, fill_value=0).astype("int64")
+        write_atomic(totals.reset_index(), self.__directory / "aggregates.parquet")
+
+    def __save_manifest(self) -> None:
+        replace_atomic(
+            self.__directory / "manifest.json",
+            lambda temp: temp.write_text(json.dumps(self.__manifest, indent=2), encoding="UTF-8"),
+        )
+
+
+def ingest_directory(directory: Path = ASSETS_DIR, ledger: Ledger | None = None) -> int:
+    """Ingest every csv in a directory, returns the number of new transactions"""
+    if ledger is None:
+        ledger = Ledger()
+    return sum(len(ledger.ingest_file(path)) for path in sorted(Path(directory).glob("*.csv")))
+
+
+if __name__ == "__main__":
+    print(f"Ingested {ingest_directory()} new transactions")
@@ -0,0 +1,157 @@
+"""
+Instrument
+==========
+Opt-in stage timers and row counters for the analysis pipeline
+
+Hot paths wrap their work in `with stage("name") as timed:` and set `timed.rows`.
+Nothing is recorded unless a Recorder is active in the current context (see
+recording()), so instrumented code costs one context variable lookup per stage
+when it's off. Recorders are per context, so every Flask request (or thread) can
+record its own stages. Stages can nest, a parent's time includes its children's.
+
+run_report() wraps a whole CLI run, optionally under cProfile and tracemalloc,
+and writes everything as one JSON report.
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+_current: ContextVar["Recorder | None"] = ContextVar("recorder", default=None)
+
+
+class Stage:
+    """A running stage, set rows to count what it processed"""
+
+    rows: int | None
+
+    def __init__(self) -> None:
+        self.rows = None
+
+
+class Recorder:
+    """Per stage call counts, seconds and rows"""
+
+    __stages: dict[str, list]
+    __lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.__stages = {}
+        self.__lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, rows: int | None = None, calls: int = 1) -> None:
+        with self.__lock:
+            totals = self.__stages.setdefault(name, [0, 0.0, 0])
+            totals[0] += calls
+            totals[1] += seconds
+            totals[2] += rows or 0
+
+    def merge(self, other: "Recorder") -> None:
+        """Add another recorder's stages into this one"""
+        for name, totals in other.stages().items():
+            self.add(name, totals["seconds"], totals["rows"], totals["calls"])
+
+    def stages(self) -> dict[str, dict]:
+        """stage -> {"calls", "seconds", "rows"}, in the order stages first ran"""
+        with self.__lock:
+            return {
+                name: {"calls": calls, "seconds": seconds, "rows": rows}
+                for name, (calls, seconds, rows) in self.__stages.items()
+            }
+
+    def server_timing(self) -> str:
+        """Stages as a Server-Timing header value, durations in milliseconds"""
+        return ", ".join(
+            f"{name.replace(' ', '_')};dur={totals['seconds'] * 1000:.1f}"
+            for name, totals in self.stages().items()
+        )
+
+
+@contextmanager
+def stage(name: str) -> Iterator[Stage]:
+    """Time the enclosed block as a stage of the active recorder, if there is one"""
+    recorder = _current.get()
+    timed = Stage()
+    if recorder is None:
+        yield timed
+        return
+    start = time.perf_counter()
+    try:
+        yield timed
+    finally:
+        recorder.add(name, time.perf_counter() - start, timed.rows)
+
+
+@contextmanager
+def recording(recorder: Recorder | None = None) -> Iterator[Recorder]:
+    """Make recorder (a new one by default) the active recorder for the enclosed block"""
+    recorder = Recorder() if recorder is None else recorder
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+
+
+def activate(recorder: Recorder):
+    """Make recorder the active recorder until deactivate(token), for hooks that can't use a with block"""
+    return _current.set(recorder)
+
+
+def deactivate(token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def run_report(
+    report: Path | None, profile: Path | None = None, trace_memory: bool = False
+) -> Iterator[Recorder | None]:
+    """
+    Record the enclosed run and write a JSON report, does nothing when report is None
+
+    Args:
+        Path report: JSON report to write
+        Path profile: also run under cProfile and dump the stats here (for snakeviz, pstats...)
+        bool trace_memory: also record peak traced memory with tracemalloc
+    """
+    if report is None:
+        yield None
+        return
+
+    profiler = cProfile.Profile() if profile is not None else None
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with recording() as recorder:
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield recorder
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            result = {"seconds": time.perf_counter() - start, "stages": recorder.stages()}
+            if trace_memory:
+                result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            if profiler is not None:
+                profiler.dump_stats(profile)
+                result["profile"] = {"path": str(profile), "top": _top_functions(profiler)}
+            Path(report).write_text(json.dumps(result, indent=2), encoding="UTF-8")
+
+
+def _top_functions(profiler: cProfile.Profile, limit: int = 20) -> list[str]:
+    """The profile's most expensive functions by cumulative time, as pstats prints them"""
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(limit)
+    lines = output.getvalue().splitlines()
+    header = next(i for i, line in enumerate(lines) if line.lstrip().startswith("ncalls"))
+    return [line.strip() for line in lines[header + 1 :] if line.strip()]
@@ -0,0 +1,132 @@
+"""
+Mappings
+========
+The user's category mappings, stored as JSON in assets/category_mappings.json
+
+The file holds the description -> category lookup index itself, so loading it to
+categorize is a single json.load, with no Python module to import and no index to build.
+The category -> descriptions dict used for editing is only derived when it's asked for.
+Every save bumps the version and goes through a temp file renamed over the old one,
+so a crash or a concurrent run never leaves a half written file behind.
+"""
+
+import ast
+import json
+from pathlib import Path
+
+from .categorizer import Categorizer, get_categorizer
+from .files import ASSETS_DIR, replace_atomic
+
+MAPPINGS_PATH = ASSETS_DIR / "category_mappings.json"
+# written by older versions as Python source, only ever read to migrate
+LEGACY_PATH = ASSETS_DIR / "category_mappings.py"
+FORMAT = 1
+
+
+class MappingStore:
+    """Category mappings file, loaded on first use"""
+
+    __path: Path
+    __payload: dict | None
+    __mapping: dict[str, list[str]] | None
+    __categorizer: Categorizer | None
+
+    def __init__(self, path: Path = MAPPINGS_PATH) -> None:
+        self.__path = Path(path)
+        self.__payload = None
+        self.__mapping = None
+        self.__categorizer = None
+
+    @property
+    def version(self) -> int:
+        """Bumped on every save, 0 if the mappings were never saved"""
+        return self.__load()["version"]
+
+    @property
+    def mapping(self) -> dict[str, list[str]]:
+        """Editable category -> descriptions dict, derived once and shared after that"""
+        if self.__mapping is None:
+            payload = self.__load()
+            mapping = {category: [] for category in payload["categories"]}
+            for description, category in payload["index"].items():
+                mapping.setdefault(category, []).append(description)
+            self.__mapping = mapping
+        return self.__mapping
+
+    def categorizer(self) -> Categorizer:
+        """Compiled index, straight from the file unless the mapping is being edited"""
+        if self.__mapping is not None:
+            return get_categorizer(self.__mapping)
+        if self.__categorizer is None:
+            self.__categorizer = Categorizer.from_index(self.__load()["index"])
+        return self.__categorizer
+
+    def save(self, mapping: dict[str, list[str]]) -> int:
+        """Atomically replace the file with this mapping, returns the new version"""
+        payload = {
+            "format": FORMAT,
+            "version": self.version + 1,
+            "categories": list(mapping),
+            "index": Categorizer(mapping).index,
+        }
+        replace_atomic(
+            self.__path,
+            lambda temp: temp.write_text(
+                json.dumps(payload, indent=0, ensure_ascii=False), encoding="UTF-8"
+            ),
+        )
+        self.__payload = payload
+        self.__mapping = mapping
+        self.__categorizer = None
+        return payload["version"]
+
+    def __load(self) -> dict:
+        if self.__payload is None:
+            if self.__path.exists():
+                payload = json.loads(self.__path.read_text(encoding="UTF-8"))
+                if payload["format"] > FORMAT:
+                    raise ValueError(
+                        f"{self.__path} was written by a newer version of finanalyzer"
+                    )
+            else:
+                mapping = read_legacy(LEGACY_PATH) if self.__path == MAPPINGS_PATH else {}
+                payload = {
+                    "format": FORMAT,
+                    "version": 0,
+                    "categories": list(mapping),
+                    "index": Categorizer(mapping).index,
+                }
+            self.__payload = payload
+        return self.__payload
+
+
+def read_legacy(path: Path) -> dict[str, list[str]]:
+    """Reads a category_mappings.py written by write_dict, without importing it"""
+    if not path.exists():
+        return {}
+    for node in ast.parse(path.read_text(encoding="UTF-8")).body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "category_mappings"
+            for target in node.targets
+        ):
+            return ast.literal_eval(node.value)
+    return {}
+
+
+_store = MappingStore()
+
+
+def load_mappings() -> dict[str, list[str]]:
+    """The user's category mappings, loaded on first use and shared after that"""
+    return _store.mapping
+
+
+def mappings_categorizer() -> Categorizer:
+    """Compiled index of the user's category mappings"""
+    return _store.categorizer()
+
+
+def save_mappings(mapping: dict[str, list[str]], path: Path = MAPPINGS_PATH) -> int:
+    """Saves category mappings, returns the new version"""
+    store = _store if Path(path) == MAPPINGS_PATH else MappingStore(path)
+    return store.save(mapping)
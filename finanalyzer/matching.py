@@ -0,0 +1,204 @@
+"""
+Matching
+========
+Prefix, token and regex rules for categorizing merchants by their Original Description
+
+Exact Description mappings break every time the bank appends a new store number
+or reference to a merchant, e.g. "HLU*Hulu 1860595027856-U HULU.COM/BILLCA".
+Rules are written per category as "kind:pattern" strings:
+
+    prefix:HLU*HULU         Original Description starts with the pattern
+    token:PLAYSTATION       the pattern appears as whole word(s)
+    regex:^SP GRILL\\w+      Python regular expression, searched anywhere
+
+Matching is case insensitive. All prefix and token rules are compiled into a single
+Aho-Corasick automaton, so one pass over a description finds every rule it matches
+no matter how many rules there are. The longest matching prefix/token rule wins,
+regex rules are only tried when no prefix/token rule matched. Regex rules are joined
+into one alternation, except those that can't be (backreferences, named groups,
+inline global flags such as (?i)), which are searched on their own. Either way the
+leftmost match wins, then the earliest rule.
+"""
+
+import re
+from collections import deque
+
+import pandas as pd
+
+from .categorizer import mapping_shape
+
+RULE_KINDS = ("prefix", "token", "regex")
+
+# marks the start of the raw text and separates it from the tokenized text,
+# so prefix patterns can only ever match at the very start
+_START = "\x02"
+_SEP = "\x03"
+_NON_WORD = re.compile(r"[^0-9A-Z]+")
+# regex constructs that change meaning or fail once wrapped in a group of a bigger pattern:
+# numbered backreferences and conditionals, named groups and inline global flags
+_STANDALONE = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]|\(\?P[<=]|\(\?\(|^\(\?[aiLmsux]+\)")
+
+
+def parse_rule(rule: str) -> tuple[str, str]:
+    """Split a "kind:pattern" rule, rules without a kind are token rules"""
+    kind, sep, pattern = rule.partition(":")
+    if not sep or kind not in RULE_KINDS:
+        kind, pattern = "token", rule
+    if not pattern.strip():
+        raise ValueError(f"Empty pattern in rule: {rule}")
+    return kind, pattern
+
+
+def _tokenize(text: str) -> str:
+    """Uppercase words separated by single spaces, padded so whole words can be matched"""
+    return f" {_NON_WORD.sub(' ', text.upper()).strip()} "
+
+
+class _Automaton:
+    """Aho-Corasick automaton that keeps only the best (longest, earliest) hit per state"""
+
+    __goto: list[dict[str, int]]
+    __fail: list[int]
+    __best: list[tuple[int, int] | None]
+
+    def __init__(self, patterns: list[str]) -> None:
+        self.__goto = [{}]
+        self.__best = [None]
+        for i, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                nxt = self.__goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self.__goto)
+                    self.__goto[state][char] = nxt
+                    self.__goto.append({})
+                    self.__best.append(None)
+                state = nxt
+            self.__best[state] = _better(self.__best[state], (len(pattern), -i))
+
+        # breadth first to set the failure links, merging hits along them
+        self.__fail = [0] * len(self.__goto)
+        queue = deque(self.__goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.__goto[state].items():
+                queue.append(nxt)
+                fail = self.__fail[state]
+                while fail and char not in self.__goto[fail]:
+                    fail = self.__fail[fail]
+                self.__fail[nxt] = self.__goto[fail].get(char, 0)
+                self.__best[nxt] = _better(self.__best[nxt], self.__best[self.__fail[nxt]])
+
+    def search(self, text: str) -> int | None:
+        """Index of the best pattern found in text, None if nothing matched"""
+        goto, fail, best = self.__goto, self.__fail, self.__best
+        state = 0
+        found = None
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if best[state] is not None:
+                found = _better(found, best[state])
+        return None if found is None else -found[1]
+
+
+def _better(a: tuple[int, int] | None, b: tuple[int, int] | None) -> tuple[int, int] | None:
+    """Longer pattern wins, then the earlier rule (stored negated)"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+class MerchantMatcher:
+    """Compiled set of category rules"""
+
+    __categories: list[str]
+    __automaton: _Automaton
+    __regex: re.Pattern | None
+    __regex_categories: list[str]
+    __standalone: list[tuple[int, re.Pattern]]
+    __shape: tuple[tuple[str, tuple[str, ...]], ...]
+
+    def __init__(self, rules: dict[str, list[str]]) -> None:
+        patterns = []
+        self.__categories = []
+        regexes = []
+        self.__regex_categories = []
+        self.__standalone = []
+        for category, category_rules in rules.items():
+            for rule in category_rules:
+                kind, pattern = parse_rule(rule)
+                if kind == "prefix":
+                    patterns.append(_START + pattern.upper())
+                    self.__categories.append(category)
+                elif kind == "token":
+                    patterns.append(_tokenize(pattern))
+                    self.__categories.append(category)
+                else:
+                    # validate each one on its own for a useful error message
+                    compiled = re.compile(pattern, re.IGNORECASE)
+                    if _STANDALONE.search(pattern):
+                        self.__standalone.append((len(self.__regex_categories), compiled))
+                    else:
+                        regexes.append(f"(?P<r{len(self.__regex_categories)}>{pattern})")
+                    self.__regex_categories.append(category)
+
+        self.__automaton = _Automaton(patterns)
+        self.__regex = re.compile("|".join(regexes), re.IGNORECASE) if regexes else None
+        self.__shape = mapping_shape(rules)
+
+    def __len__(self) -> int:
+        return len(self.__categories) + len(self.__regex_categories)
+
+    def is_current(self, rules: dict[str, list[str]]) -> bool:
+        """Check whether the rules have changed since this matcher was compiled"""
+        return mapping_shape(rules) == self.__shape
+
+    def match_one(self, text: str) -> str | None:
+        """Category for a single Original Description, None if no rule matches"""
+        if not isinstance(text, str):
+            return None
+        hit = self.__automaton.search(f"{_START}{text.upper()}{_SEP}{_tokenize(text)}")
+        if hit is not None:
+            return self.__categories[hit]
+        best = None
+        if self.__regex is not None:
+            found = self.__regex.search(text)
+            if found is not None:
+                best = (found.start(), int(found.lastgroup[1:]))
+        for rule, regex in self.__standalone:
+            found = regex.search(text)
+            if found is not None and (best is None or (found.start(), rule) < best):
+                best = (found.start(), rule)
+        return None if best is None else self.__regex_categories[best[1]]
+
+    def match(self, texts: pd.Series) -> pd.Series:
+        """
+        Categorize a column of Original Descriptions
+
+        Each distinct description is only run through the automaton once
+
+        Args:
+            pd.Series texts: Original Description column
+        Returns:
+            Series of categories, NaN where no rule matched
+        """
+        uniques = texts.dropna().unique()
+        lookup = {text: self.match_one(text) for text in uniques}
+        return texts.map(lookup)
+
+
+# keyed by id, the rules are kept alongside so the id can't be reused
+_compiled: dict[int, tuple[dict[str, list[str]], MerchantMatcher]] = {}
+
+
+def get_matcher(rules: dict[str, list[str]]) -> MerchantMatcher:
+    """Return the compiled matcher for a rule set, only recompiling when the rules change"""
+    _, matcher = _compiled.get(id(rules), (None, None))
+    if matcher is None or not matcher.is_current(rules):
+        matcher = MerchantMatcher(rules)
+        _compiled[id(rules)] = (rules, matcher)
+    return matcher
@@ -0,0 +1,127 @@
+"""
+Parallel
+========
+Parse, clean and categorize bank exports on a process pool
+
+Large exports are split into pieces at line boundaries, so one big file uses every
+core too. Each worker is handed the compiled mappings and rules once, when it starts,
+and results are merged in input order so the output doesn't depend on scheduling.
+Pieces are split on newlines, which assumes no quoted field spans several lines.
+
+Command line:
+    python -m finanalyzer.parallel --workers 4 [export.csv ...]
+"""
+
+import argparse
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+
+from .assets.category_rules import category_rules
+from .categorizer import Categorizer
+from .files import ASSETS_DIR, file_digest
+from .ingest import Ledger
+from .mappings import mappings_categorizer
+from .matching import MerchantMatcher, get_matcher
+from .transactions import clean_transactions
+
+PIECE_BYTES = 32 * 1024 * 1024
+
+# set once per worker process by _init_worker
+_categorizer: Categorizer | None = None
+_matcher: MerchantMatcher | None = None
+
+
+def split_file(path: str | Path, piece_bytes: int = PIECE_BYTES) -> list[tuple[str, int, int]]:
+    """(path, start, stop) byte ranges of about piece_bytes, each starting on a new line"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as infile:
+        header_end = len(infile.readline())
+        starts = [header_end]
+        while starts[-1] + piece_bytes < size:
+            infile.seek(starts[-1] + piece_bytes)
+            infile.readline()
+            starts.append(infile.tell())
+    stops = starts[1:] + [size]
+    return [(str(path), start, stop) for start, stop in zip(starts, stops) if start < stop]
+
+
+def _init_worker(categorizer: Categorizer, matcher: MerchantMatcher) -> None:
+    global _categorizer, _matcher
+    _categorizer = categorizer
+    _matcher = matcher
+
+
+def _clean_piece(piece: tuple[str, int, int], transfers: bool = False) -> pd.DataFrame:
+    """Worker task, parse and clean one byte range of an export"""
+    path, start, stop = piece
+    with open(path, "rb") as infile:
+        header = infile.readline()
+        infile.seek(start)
+        data = infile.read(stop - start)
+    df = pd.read_csv(io.BytesIO(header + data))
+    return clean_transactions(df, _categorizer, _matcher, transfers)
+
+
+def clean_parallel(
+    paths: list[str | Path],
+    workers: int | None = None,
+    piece_bytes: int = PIECE_BYTES,
+    transfers: bool = False,
+) -> list[pd.DataFrame]:
+    """
+    Cleaned transactions of several exports, processed in parallel
+
+    Args:
+        list paths: bank export csvs
+        int workers: worker processes, defaults to the number of cores
+        int piece_bytes: split files larger than this
+        bool transfers: keep internal transfers, e.g. for the ledger
+    Returns:
+        one DataFrame of cleaned transactions per export, in the same order
+    """
+    pieces = [split_file(path, piece_bytes) for path in paths]
+    categorizer = mappings_categorizer()
+    matcher = get_matcher(category_rules)
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(categorizer, matcher)
+    ) as executor:
+        # map keeps input order, so the merge is deterministic
+        clean = partial(_clean_piece, transfers=transfers)
+        cleaned = iter(executor.map(clean, [piece for file in pieces for piece in file]))
+        return [
+            pd.concat([next(cleaned) for _ in file], ignore_index=True) if file else pd.DataFrame()
+            for file in pieces
+        ]
+
+
+def main():
+    """Runtime function"""
+    parser = argparse.ArgumentParser(description="Ingest bank exports in parallel")
+    parser.add_argument("csv", nargs="*", help="defaults to every csv in the assets folder")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    ledger = Ledger()
+    # like Ledger.ingest_file, exports already ingested are skipped outright
+    digests = {}
+    for path in args.csv or sorted(ASSETS_DIR.glob("*.csv")):
+        digest = file_digest(path)
+        if not ledger.has_file(digest):
+            digests.setdefault(digest, path)
+
+    new = 0
+    cleaned = clean_parallel(list(digests.values()), args.workers, transfers=True)
+    for digest, df in zip(digests, cleaned):
+        # one export at a time, duplicates are only counted within an export
+        new += len(ledger.ingest(df))
+        ledger.add_file(digest)
+    print(f"Ingested {new} new transactions")
+
+
+if __name__ == "__main__":
+    main()
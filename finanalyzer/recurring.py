@@ -0,0 +1,184 @@
+"""
+Recurring
+=========
+Vectorized detection of recurring charges, subscriptions, rent, paychecks...
+
+A merchant's transactions recur when they come at a regular cadence (weekly to yearly)
+for similar amounts. Transactions are sorted once by merchant and date, then every
+step from one transaction to the merchant's next one is scored with array operations
+and a groupby, so detection is O(n log n) in the number of transactions,
+there are no per-merchant or pairwise Python loops.
+Works on regular and lean transaction frames.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .aggregate import amount_cents, date_column, day_numbers, to_dates
+from .instrument import stage
+
+# cadence: (days between transactions, tolerance in days, offset to the next one)
+CADENCES = {
+    "weekly": (7, 1, pd.DateOffset(weeks=1)),
+    "biweekly": (14, 2, pd.DateOffset(weeks=2)),
+    "monthly": (30.4, 4, pd.DateOffset(months=1)),
+    "quarterly": (91.3, 8, pd.DateOffset(months=3)),
+    "yearly": (365.25, 12, pd.DateOffset(years=1)),
+}
+MIN_OCCURRENCES = 3
+# share of steps that must land on the cadence, and be within AMOUNT_TOLERANCE of the previous amount
+MIN_REGULAR = 0.75
+AMOUNT_TOLERANCE = 0.25
+# amount steps bigger than this are reported as price changes, smaller ones are noise
+PRICE_CHANGE = 0.02
+
+
+def _steps(df: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray]:
+    """
+    Every step from a transaction to the same merchant's next one
+
+    Returns:
+        DataFrame with the step's Merchant code, Gap in days, Previous and new Cents and Day
+        array of merchant names, indexed by Merchant code
+    """
+    column = date_column(df)
+    days = df[column].to_numpy() if column == "Day" else day_numbers(df[column])
+    cents = amount_cents(df).to_numpy()
+    codes, merchants = pd.factorize(df["Description"])
+
+    order = np.lexsort((days, codes))
+    codes, days, cents = codes[order], days[order], cents[order]
+    same = (codes[1:] == codes[:-1]) & (codes[1:] >= 0)
+    steps = pd.DataFrame(
+        {
+            "Merchant": codes[1:][same],
+            "Gap": np.diff(days)[same],
+            "Previous": cents[:-1][same],
+            "Cents": cents[1:][same],
+            "Day": days[1:][same],
+        }
+    )
+    return steps, np.asarray(merchants)
+
+
+def _cadence(interval: pd.Series) -> pd.Series:
+    """Name of the cadence each median interval matches, NaN when none does"""
+    cadence = pd.Series(np.nan, index=interval.index, dtype=object)
+    for name, (days, tolerance, _) in CADENCES.items():
+        cadence[(interval - days).abs() <= tolerance] = name
+    return cadence
+
+
+def detect_recurring(df: pd.DataFrame, min_occurrences: int = MIN_OCCURRENCES) -> pd.DataFrame:
+    """
+    Merchants with recurring transactions
+
+    Args:
+        DataFrame df: cleaned transactions, any date range and order
+        int min_occurrences: fewest transactions that can count as recurring
+    Returns:
+        DataFrame indexed by Description with Cadence, Interval (median days),
+        Count, Amount (latest), Category (latest), First, Last, Next (expected date),
+        Changes (number of price changes) and Yearly (Amount at this cadence for a year),
+        ordered by Yearly cost
+    """
+    with stage("recurring") as timed:
+        timed.rows = len(df)
+        steps, names = _steps(df)
+        steps["Step"] = (steps["Cents"] - steps["Previous"]).abs() / steps["Previous"].abs().clip(lower=1)
+
+        by_merchant = steps.groupby("Merchant")
+        merchants = pd.DataFrame(
+            {"Interval": by_merchant["Gap"].median(), "Steps": by_merchant["Gap"].size()}
+        )
+        merchants["Cadence"] = _cadence(merchants["Interval"])
+        merchants = merchants[
+            merchants["Cadence"].notna() & (merchants["Steps"] + 1 >= min_occurrences)
+        ]
+
+        # how many of each merchant's steps land on its cadence, for a similar amount
+        steps = steps[steps["Merchant"].isin(merchants.index)]
+        interval = merchants["Cadence"].map({name: days for name, (days, _, _) in CADENCES.items()})
+        tolerance = merchants["Cadence"].map({name: days for name, (_, days, _) in CADENCES.items()})
+        off_cadence = (steps["Gap"] - interval.reindex(steps["Merchant"]).to_numpy()).abs()
+        steps = steps.assign(
+            Regular=(off_cadence <= tolerance.reindex(steps["Merchant"]).to_numpy())
+            & (steps["Step"] <= AMOUNT_TOLERANCE),
+            Changed=steps["Step"] > PRICE_CHANGE,
+        )
+        by_merchant = steps.groupby("Merchant")
+        merchants["Regular"] = by_merchant["Regular"].mean()
+        merchants["Changes"] = by_merchant["Changed"].sum()
+        merchants["Cents"] = by_merchant["Cents"].last()
+        merchants["First"] = by_merchant["Day"].first() - by_merchant["Gap"].first()
+        merchants["Last"] = by_merchant["Day"].last()
+        merchants = merchants[merchants["Regular"] >= MIN_REGULAR]
+
+        result = pd.DataFrame(
+            {
+                "Cadence": merchants["Cadence"],
+                "Interval": merchants["Interval"],
+                "Count": merchants["Steps"] + 1,
+                "Amount": merchants["Cents"] / 100,
+                "First": to_dates(merchants["First"]),
+                "Last": to_dates(merchants["Last"]),
+                "Changes": merchants["Changes"].astype("int64"),
+            }
+        )
+        result["Next"] = _next(result["Last"], result["Cadence"])
+        result["Yearly"] = result["Amount"] * result["Cadence"].map(
+            {name: round(365.25 / days) for name, (days, _, _) in CADENCES.items()}
+        )
+        result.index = pd.Index(names[result.index], name="Description")
+        result = result.join(_latest_category(df, result.index))
+        columns = ["Cadence", "Interval", "Count", "Amount", "Category", "First", "Last", "Next", "Changes", "Yearly"]
+        return result[columns].sort_values("Yearly", key=np.abs, ascending=False)
+
+
+def price_changes(df: pd.DataFrame, recurring: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Every change in price of a recurring merchant
+
+    Args:
+        DataFrame df: cleaned transactions
+        DataFrame recurring: detect_recurring(df), detected when not given
+    Returns:
+        DataFrame with Description, Date, Previous, Amount and Change, in date order,
+        Change is relative to the previous amount's size, 0.2 for a 20% price rise
+    """
+    if recurring is None:
+        recurring = detect_recurring(df)
+    steps, merchants = _steps(df)
+    steps = steps[np.isin(merchants[steps["Merchant"]], recurring.index.to_numpy())]
+    change = (steps["Cents"].abs() - steps["Previous"].abs()) / steps["Previous"].abs().clip(lower=1)
+    steps = steps[change.abs() > PRICE_CHANGE]
+    return pd.DataFrame(
+        {
+            "Description": merchants[steps["Merchant"]],
+            "Date": to_dates(steps["Day"]).to_numpy(),
+            "Previous": steps["Previous"].to_numpy() / 100,
+            "Amount": steps["Cents"].to_numpy() / 100,
+            "Change": change[steps.index].to_numpy(),
+        }
+    ).sort_values("Date", kind="stable", ignore_index=True)
+
+
+def _next(last: pd.Series, cadence: pd.Series) -> pd.Series:
+    """Expected date of the next transaction, one cadence after the last one"""
+    following = last.copy()
+    for name, (_, _, offset) in CADENCES.items():
+        at = cadence == name
+        if at.any():
+            following[at] = last[at] + offset
+    return following
+
+
+def _latest_category(df: pd.DataFrame, descriptions: pd.Index) -> pd.Series:
+    """Category of each merchant's most recent transaction"""
+    if "Category" not in df.columns:
+        return pd.Series(np.nan, index=descriptions, name="Category")
+    column = date_column(df)
+    recent = df[df["Description"].isin(descriptions)].sort_values(column, kind="stable")
+    latest = recent.groupby("Description", observed=True)["Category"].last().astype(object)
+    latest.index = latest.index.astype(object)
+    return latest.rename("Category")
@@ -0,0 +1,107 @@
+"""
+Render
+======
+Headless chart rendering for the CLI and the Flask app
+
+Charts are drawn on explicit Figure objects with the Agg canvas and never touch
+pyplot's global state, so rendering is safe from any thread and needs no display.
+Rendered charts are kept in an LRU cache keyed by whatever identifies the chart
+(user, period, filters and data version), so repeat views skip both the
+aggregation and the drawing. matplotlib is only imported by the first render.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+from .instrument import stage
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def draw_pie(ax: "Axes", aggregated_df: pd.DataFrame) -> None:
+    """Pie chart of the Sum column on the given axes"""
+    ax.pie(
+        aggregated_df["Sum"],
+        labels=aggregated_df.index,
+        autopct="%1.1f%%",
+        radius=1.5,
+        rotatelabels=True,
+    )
+
+
+def render_pie(aggregated_df: pd.DataFrame, fmt: str = "png", title: str | None = None) -> bytes:
+    """
+    Renders a pie chart to image bytes
+
+    Args:
+        DataFrame aggregated_df: per-category totals with a Sum column
+        str fmt: one of FORMATS
+        str title: optional chart title
+    Returns:
+        the encoded image
+    """
+    # deferred, matplotlib takes longer to import than most requests take to serve
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported chart format: {fmt}")
+    with stage("render"):
+        fig = Figure(figsize=(8, 8))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        if aggregated_df.empty:
+            ax.text(0.5, 0.5, "No transactions", ha="center", va="center")
+            ax.axis("off")
+        else:
+            draw_pie(ax, aggregated_df)
+        if title:
+            ax.set_title(title, pad=60)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, bbox_inches="tight")
+        return buffer.getvalue()
+
+
+class ChartCache:
+    """Thread-safe LRU cache of rendered charts"""
+
+    __charts: OrderedDict[Hashable, bytes]
+    __maxsize: int
+    __lock: threading.Lock
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self.__charts = OrderedDict()
+        self.__maxsize = maxsize
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__charts)
+
+    def get_or_render(self, key: Hashable, render: Callable[[], bytes]) -> bytes:
+        """Cached chart for key, calling render (aggregation included) only on a miss"""
+        with self.__lock:
+            if key in self.__charts:
+                self.__charts.move_to_end(key)
+                return self.__charts[key]
+
+        # render outside the lock, a duplicate render on a race is harmless
+        chart = render()
+
+        with self.__lock:
+            self.__charts[key] = chart
+            self.__charts.move_to_end(key)
+            while len(self.__charts) > self.__maxsize:
+                self.__charts.popitem(last=False)
+        return chart
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__charts.clear()
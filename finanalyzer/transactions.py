@@ -0,0 +1,200 @@
+"""
+Transactions
+============
+Cleaning bank exports into the transaction frame the rest of finanalyzer works on
+
+Exports are expected to have the columns
+Date,Description,Original Description,Category,Amount,Status
+"""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pandas as pd
+
+from .aggregate import RunningTotals, day_numbers, to_cents
+from .assets.category_rules import category_rules
+from .categorizer import Categorizer, mapping_version
+from .instrument import stage
+from .mappings import mappings_categorizer
+from .matching import MerchantMatcher, get_matcher
+
+COLUMNS = ["Date", "Description", "Original Description", "Category", "Amount", "Status"]
+CATEGORICAL = ["Description", "Original Description", "Category", "Original Category", "Status"]
+# in lean frames, columns with more distinct values per row than this stay plain strings,
+# a categorical's codes and dictionary cost more than the strings they'd dedupe
+LEAN_MAX_DISTINCT = 0.5
+# money moved between the user's own accounts, neither spent nor earned
+TRANSFER = "Internal Transfer"
+
+
+def clean_transactions(
+    df: pd.DataFrame,
+    categorizer: Categorizer | None = None,
+    matcher: MerchantMatcher | None = None,
+    transfers: bool = False,
+) -> pd.DataFrame:
+    """
+    Cleans dates, recategorizes, removes internal transfers
+
+    Args:
+        DataFrame df: transactions as read from a bank export
+        Categorizer categorizer: compiled mappings, defaults to the user's category mappings
+        MerchantMatcher matcher: compiled rules, defaults to the user's category rules
+        bool transfers: keep internal transfers, for stores that may be recategorized later
+    Returns:
+        DataFrame with usable dates and user categories
+    """
+    with stage("clean") as timed:
+        timed.rows = len(df)
+
+        # clean dates
+        with stage("dates"):
+            df["Date"] = pd.to_datetime(df["Date"])
+
+        # recategorize, keeping the bank's category alongside
+        df["Original Category"] = df["Category"]
+        df["Category"] = categorize(df, categorizer, matcher)
+
+        if not transfers:
+            df = without_transfers(df)
+
+    return df
+
+
+def without_transfers(df: pd.DataFrame, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Transactions that aren't internal transfers
+
+    Args:
+        DataFrame df: cleaned transactions, with a Category column
+        list columns: only keep these columns, once Category has been used
+    """
+    df = df[df["Category"] != TRANSFER]
+    return df if columns is None else df[columns]
+
+
+def with_category(columns: list[str] | None) -> list[str] | None:
+    """Columns to read so transfers can be told apart, see without_transfers"""
+    if columns is None or "Category" in columns:
+        return columns
+    return [*columns, "Category"]
+
+
+def iter_csv(path: str | Path, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+    """Cleaned transactions of a bank export, read and cleaned chunksize rows at a time"""
+    with pd.read_csv(path, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield clean_transactions(chunk)
+
+
+def stream_totals(
+    path: str | Path, freq: str = "month", chunksize: int = 100_000
+) -> RunningTotals:
+    """
+    Period by category totals of a bank export of any size
+
+    Only one chunk is in memory at a time, the result matches
+    period_totals() of the whole cleaned export
+
+    Args:
+        str path: bank export csv
+        str freq: granularity or pandas frequency
+        int chunksize: rows per chunk
+    Returns:
+        RunningTotals folded over every chunk
+    """
+    running = RunningTotals(freq)
+    for chunk in iter_csv(path, chunksize):
+        running.add(chunk)
+    return running
+
+
+def categorize(
+    df: pd.DataFrame,
+    categorizer: Categorizer | None = None,
+    matcher: MerchantMatcher | None = None,
+) -> pd.Series:
+    """User category for each transaction, falling back on the merchant rules for anything not mapped exactly"""
+    with stage("categorize") as timed:
+        timed.rows = len(df)
+        if categorizer is None:
+            categorizer = mappings_categorizer()
+        # object dtype, compacted frames have categorical descriptions
+        categories = categorizer.categorize(df["Description"]).astype(object)
+        unmapped = categories.isna()
+        if unmapped.any():
+            if matcher is None:
+                matcher = get_matcher(category_rules)
+            with stage("match_rules") as matched:
+                matched.rows = int(unmapped.sum())
+                categories = categories.fillna(
+                    matcher.match(df.loc[unmapped, "Original Description"]).astype(object)
+                )
+    return categories
+
+
+def mappings_version(categorizer: Categorizer | None = None) -> str:
+    """
+    Changes whenever the category mappings or rules change, i.e. whenever categorize() would
+
+    Args:
+        Categorizer categorizer: compiled mappings, defaults to the user's category mappings
+    """
+    if categorizer is None:
+        categorizer = mappings_categorizer()
+    return f"{categorizer.version}-{mapping_version(category_rules)}"
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleaned transactions with compact dtypes for storage
+
+    Strings become categoricals and Amount becomes int64 Cents
+    """
+    out = pd.DataFrame({"Date": df["Date"].astype("datetime64[ns]")})
+    for column in CATEGORICAL:
+        if column in df.columns:
+            out[column] = df[column].astype("category")
+    out["Cents"] = to_cents(df["Amount"])
+    return out.reset_index(drop=True)
+
+
+def lean(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleaned or compacted transactions as the lean frame, for analysing long histories
+
+    Date becomes Day, an int32 day number (see aggregate.EPOCH), Amount becomes int64
+    Cents and repetitive strings become categoricals, so each distinct one is only stored once.
+    The period classes and aggregate functions work on lean frames as they are.
+    Any of the columns can be left out.
+    """
+    out = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    if "Date" in df.columns:
+        out["Day"] = day_numbers(df["Date"])
+    for column in CATEGORICAL:
+        if column not in df.columns:
+            continue
+        if df[column].nunique() <= LEAN_MAX_DISTINCT * len(df):
+            out[column] = df[column].astype("category").array
+        else:
+            out[column] = df[column].astype(object).to_numpy()
+    if "Cents" in df.columns:
+        out["Cents"] = df["Cents"].to_numpy()
+    elif "Amount" in df.columns:
+        out["Cents"] = to_cents(df["Amount"]).to_numpy()
+    return out
+
+
+def stored_columns(columns: list[str] | None) -> list[str] | None:
+    """Names of the columns as stored by compact()"""
+    if columns is None:
+        return None
+    return ["Cents" if column == "Amount" else column for column in columns]
+
+
+def expand(df: pd.DataFrame) -> pd.DataFrame:
+    """Undo compact(), giving back a float Amount column"""
+    if "Cents" in df.columns:
+        df = df.assign(Amount=df["Cents"] / 100).drop(columns="Cents")
+    return df
@@ -3,7 +3,3 @@ Flask App
 =========
 Flask web app interface for finance analyzer
 """
-
-from dotenv import load_dotenv
-
-load_dotenv()
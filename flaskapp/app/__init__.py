@@ -1,59 +1,87 @@
 """
 Flask App Init
 =====================
-Initializes and configures the Flask app
-Registers the auth and routes blueprints
+App factory, creates and configures the Flask app
+Registers the api, auth, metrics and routes blueprints
+
+Importing this package has no side effects, nothing is created until create_app() is called.
+See flaskapp/run.py for the debug server and flaskapp/wsgi.py for production.
 """
 
 import os
-from datetime import date
-from logging.config import dictConfig
+import time
 from pathlib import Path
 
+from dotenv import load_dotenv
 from flask import Flask
 
-from flaskapp.app import auth, db, routes
-
-instance_path = Path(Path(__file__).parent.parent, "instance")
-instance_path.mkdir(exist_ok=True, parents=True)
-log_path = instance_path / "logs" / f"{date.today()}.log"
-log_path.parent.mkdir(exist_ok=True, parents=True)
-
-dictConfig(
-    {
-        "version": 1,
-        "formatters": {
-            "default": {
-                "format": "[%(asctime)s] %(levelname)s in %(module)s: %(message)s",
-            },
-        },
-        "handlers": {
-            "file": {
-                "level": "INFO",
-                "formatter": "default",
-                "class": "logging.FileHandler",
-                "filename": str(log_path),
-                "mode": "a",
-            },
-        },
-        "root": {"level": "INFO", "handlers": ["file"]},
-    }
-)
-
-# create and configure the app
-app_object = Flask(__name__, instance_path=instance_path, instance_relative_config=True)
-app_object.config.from_mapping(
-    SECRET_KEY=os.environ.get("SECRET_KEY", "dev"),
-    DATABASE=Path(app_object.instance_path, "mydb.sqlite"),
-)
-
-# blueprints
-app_object.register_blueprint(auth.bp)
-app_object.register_blueprint(routes.bp)
-
-# db requires app context
-with app_object.app_context():
-    db.init_app()
-    if not Path(app_object.config["DATABASE"]).exists():
-        # init database if it doesn't already exist
-        db.init_db()
+from flaskapp.app import api, auth, db, jobs, logs, metrics, routes
+
+INSTANCE_PATH = Path(Path(__file__).parent.parent, "instance")
+
+
+def create_app(test_config: dict | None = None) -> Flask:
+    """
+    Creates and configures the app
+
+    Safe to call from several worker processes at once, the database tables
+    are only ever created if they don't exist yet
+
+    Args:
+        dict test_config: settings applied over the defaults and the environment
+    Returns:
+        Flask app
+    """
+    started = time.perf_counter()
+    load_dotenv()
+    app = Flask(__name__, instance_path=str(INSTANCE_PATH), instance_relative_config=True)
+    app.config.from_mapping(
+        SECRET_KEY=os.environ.get("SECRET_KEY", "dev"),
+        DATABASE=Path(app.instance_path, "mydb.sqlite"),
+        # one transaction store per user in here
+        TRANSACTIONS=Path(app.instance_path, "transactions"),
+        UPLOADS=Path(app.instance_path, "uploads"),
+        LOG_DIR=Path(app.instance_path, "logs"),
+        # days of log files kept
+        LOG_BACKUPS=30,
+        # first scheme hashes new passwords, anything else is rehashed on login
+        PASSWORD_SCHEMES=["sha256_crypt"],
+        # schemes earlier deployments may have hashed with, verified and rehashed on login
+        PASSWORD_LEGACY_SCHEMES=auth.LEGACY_SCHEMES,
+        # e.g. {"sha256_crypt": 200000}, passlib's defaults when empty
+        PASSWORD_ROUNDS={},
+        # auth attempts per IP and per username, tokens per second and bucket size
+        AUTH_RATE=0.1,
+        AUTH_BURST=5,
+        # bearer token for /metrics without logging in, logged in users only when unset
+        METRICS_TOKEN=None,
+    )
+    # override any of the above with FLASK_ environment variables, values are parsed as JSON
+    app.config.from_prefixed_env()
+    if test_config is not None:
+        app.config.from_mapping(test_config)
+
+    Path(app.instance_path).mkdir(exist_ok=True, parents=True)
+    logs.start_logging(app.config["LOG_DIR"], app.config["LOG_BACKUPS"])
+
+    # request timing first, so it includes every other hook
+    with app.app_context():
+        metrics.init_app()
+
+    # blueprints
+    app.register_blueprint(api.bp)
+    app.register_blueprint(auth.bp)
+    app.register_blueprint(metrics.bp)
+    app.register_blueprint(routes.bp)
+
+    # db requires app context
+    with app.app_context():
+        db.init_app()
+        auth.init_app()
+        jobs.init_app()
+        db.ensure_db()
+        metrics.get_metrics().startup(create_app=time.perf_counter() - started)
+    # a server may fork workers from here, they mustn't share this thread's connections
+    db.close_pool()
+
+    return app
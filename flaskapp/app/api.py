@@ -0,0 +1,175 @@
+"""
+API
+==============
+Flask Blueprint for the JSON analytics API
+
+Every response is read from the logged in user's own transaction store, from its
+materialized daily totals, and tagged with an ETag derived from the user and the
+store's data version, so a dashboard polling with If-None-Match gets a bodyless 304
+until new transactions are loaded, and no cache can hand one user's response to another.
+Bodies are gzipped for clients that accept it.
+
+Endpoints take optional ?first=YYYY-MM-DD&end=YYYY-MM-DD query parameters,
+end is exclusive.
+
+Uploads and recategorization are queued as background jobs, the response points
+at /api/jobs/<id> for their progress.
+"""
+
+import gzip
+import hashlib
+from collections.abc import Callable
+from datetime import date
+from pathlib import Path
+from uuid import uuid4
+
+from flask import Blueprint, Response, abort, current_app, g, jsonify, request, url_for
+
+from finanalyzer.database import PERIODS, TransactionStore
+from flaskapp.app.db import get_transactions, transactions_path
+from flaskapp.app.jobs import Job, get_jobs, ingest_task, recategorize_task
+
+bp = Blueprint("api", __name__, url_prefix="/api")
+
+# bodies smaller than this aren't worth compressing
+GZIP_MIN_BYTES = 512
+
+
+@bp.before_request
+def before_request():
+    """Check if logged in first"""
+    if not g.user:
+        abort(401)
+
+
+def _date_args() -> tuple[date | None, date | None]:
+    """first and end query parameters, ignoring malformed dates"""
+    return (
+        request.args.get("first", type=date.fromisoformat),
+        request.args.get("end", type=date.fromisoformat),
+    )
+
+
+def _conditional_json(build: Callable[[TransactionStore], dict]) -> Response:
+    """
+    JSON response that is only built when the client's copy is out of date
+
+    Args:
+        Callable build: builds the response body from the user's transaction store
+    Returns:
+        304 if If-None-Match matches the current ETag, otherwise the (gzipped) JSON body
+    """
+    store = get_transactions()
+    etag = hashlib.sha1(f"{g.user_id}:{store.version}:{request.full_path}".encode()).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build(store))
+        if request.accept_encodings["gzip"] and response.content_length >= GZIP_MIN_BYTES:
+            response.set_data(gzip.compress(response.get_data()))
+            response.headers["Content-Encoding"] = "gzip"
+    # weak, the body is the same whether or not it was gzipped
+    response.set_etag(etag, weak=True)
+    # only the user's own browser may keep a copy
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+@bp.route("/summary")
+def summary():
+    """Income, costs and transaction count for a date range"""
+    first, end = _date_args()
+
+    def build(store: TransactionStore) -> dict:
+        totals = store.category_totals(first, end)
+        is_income = totals.index == "Income"
+        income = float(totals.loc[is_income, "Sum"].sum())
+        costs = float(totals.loc[~is_income, "Sum"].sum())
+        return {
+            "first": first and first.isoformat(),
+            "end": end and end.isoformat(),
+            "income": round(income, 2),
+            "costs": round(costs, 2),
+            "net": round(income + costs, 2),
+            "count": int(totals["Count"].sum()),
+        }
+
+    return _conditional_json(build)
+
+
+@bp.route("/categories")
+def categories():
+    """Per-category totals for a date range"""
+    first, end = _date_args()
+
+    def build(store: TransactionStore) -> dict:
+        totals = store.category_totals(first, end)
+        return {
+            "categories": [
+                {"category": category, "sum": round(float(row.Sum), 2), "count": int(row.Count)}
+                for category, row in totals.iterrows()
+            ]
+        }
+
+    return _conditional_json(build)
+
+
+@bp.route("/periods/<granularity>")
+def periods(granularity: str):
+    """Period by category totals, granularity is one of day, week, month, quarter or year"""
+    if granularity not in PERIODS:
+        abort(404)
+    first, end = _date_args()
+
+    def build(store: TransactionStore) -> dict:
+        totals = store.period_totals(granularity, first, end).round(2)
+        return {
+            "granularity": granularity,
+            "categories": [str(category) for category in totals.columns],
+            "periods": [
+                {"period": period.date().isoformat(), "totals": row.to_dict()}
+                for period, row in totals.iterrows()
+            ],
+        }
+
+    return _conditional_json(build)
+
+
+def _accepted(job: Job) -> tuple[Response, int, dict]:
+    """202 pointing at the job's status"""
+    status_url = url_for("api.job_status", job_id=job.id)
+    return jsonify(job.to_dict()), 202, {"Location": status_url}
+
+
+@bp.route("/uploads", methods=("POST",))
+def upload():
+    """Store an uploaded bank export and queue it for ingestion"""
+    export = request.files.get("file")
+    if export is None or not export.filename.lower().endswith(".csv"):
+        abort(400, "Upload a bank export csv as the file field")
+
+    uploads = Path(current_app.config["UPLOADS"])
+    uploads.mkdir(exist_ok=True, parents=True)
+    path = uploads / f"{uuid4().hex}.csv"
+    export.save(path)
+    current_app.logger.info("%s - uploaded %s as %s", g.ip, export.filename, path.name)
+
+    task = ingest_task(path, transactions_path(g.user_id))
+    return _accepted(get_jobs().submit("ingest", g.user, task))
+
+
+@bp.route("/recategorize", methods=("POST",))
+def recategorize():
+    """Queue recategorizing all of the user's history with the current mappings"""
+    task = recategorize_task(transactions_path(g.user_id))
+    return _accepted(get_jobs().submit("recategorize", g.user, task))
+
+
+@bp.route("/jobs/<job_id>")
+def job_status(job_id: str):
+    """State and progress of one of the user's jobs"""
+    job = get_jobs().get(job_id)
+    if job is None or job.owner != g.user:
+        abort(404)
+    return jsonify(job.to_dict())
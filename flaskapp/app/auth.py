@@ -4,6 +4,9 @@ Authentication
 Flask Blueprint for authentication page behaviour
 """
 
+import threading
+import time
+from collections.abc import Callable
 from pathlib import Path
 from string import ascii_lowercase, ascii_uppercase, digits, punctuation
 
@@ -18,12 +21,96 @@ from flask import (
     session,
     url_for,
 )
-from passlib.hash import sha256_crypt
+from passlib.context import CryptContext
+from passlib.exc import UnknownHashError
 
 from flaskapp.app.db import get_db
+from flaskapp.app.ratelimit import TokenBucketLimiter
 
 bp = Blueprint("auth", __name__, url_prefix="/auth")
 
+# seconds a cached user lookup is trusted before going back to the db
+USER_CACHE_TTL = 60.0
+# pure python passlib schemes older hashes may use, kept verifiable whatever PASSWORD_SCHEMES says
+LEGACY_SCHEMES = ["sha256_crypt", "sha512_crypt", "pbkdf2_sha256", "pbkdf2_sha512"]
+
+
+class UserCache:
+    """Small TTL cache of user id -> username, so a request doesn't cost a user query"""
+
+    __users: dict[int, tuple[float, str]]
+    __ttl: float
+    __lock: threading.Lock
+
+    def __init__(self, ttl: float = USER_CACHE_TTL) -> None:
+        self.__users = {}
+        self.__ttl = ttl
+        self.__lock = threading.Lock()
+
+    def get(self, user_id: int, load: Callable[[int], str | None]) -> str | None:
+        """Cached username, calling load on a miss or once the entry has expired"""
+        now = time.monotonic()
+        with self.__lock:
+            entry = self.__users.get(user_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        username = load(user_id)
+        with self.__lock:
+            if username is None:
+                self.__users.pop(user_id, None)
+            else:
+                self.__users[user_id] = (now + self.__ttl, username)
+        return username
+
+    def invalidate(self, user_id: int) -> None:
+        with self.__lock:
+            self.__users.pop(user_id, None)
+
+
+user_cache = UserCache()
+
+COMMON_PASSWORDS_PATH = Path(__file__).parent.joinpath("static", "CommonPassword.txt")
+
+
+class CommonPasswords:
+    """
+    Common password blocklist, loaded once into a frozenset
+    The file is checked for changes on each lookup and reloaded when it has changed
+    """
+
+    __path: Path
+    __passwords: frozenset[str]
+    __stamp: tuple[int, int] | None
+    __lock: threading.Lock
+
+    def __init__(self, path: Path = COMMON_PASSWORDS_PATH) -> None:
+        self.__path = Path(path)
+        self.__passwords = frozenset()
+        self.__stamp = None
+        self.__lock = threading.Lock()
+        self.__reload_if_changed()
+
+    def __contains__(self, password: str) -> bool:
+        self.__reload_if_changed()
+        return password.strip().lower() in self.__passwords
+
+    def __len__(self) -> int:
+        return len(self.__passwords)
+
+    def __reload_if_changed(self) -> None:
+        stat = self.__path.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self.__stamp:
+            return
+        with self.__lock:
+            if stamp != self.__stamp:
+                with open(self.__path, "r", encoding="UTF-8") as common_file:
+                    self.__passwords = frozenset(
+                        line.strip().lower() for line in common_file if line.strip()
+                    )
+                self.__stamp = stamp
+
 
 class AuthError(Exception):
     """Exception class to flash and log any auth error message"""
@@ -36,6 +123,42 @@ class AuthError(Exception):
         current_app.logger.info("%s - %s", *(g.ip, message))
 
 
+class RateLimitError(AuthError):
+    """Auth error for an attempt refused by the rate limiter, answered with a 429"""
+
+
+def password_context(
+    schemes: list[str], rounds: dict[str, int], legacy: list[str] = LEGACY_SCHEMES
+) -> CryptContext:
+    """
+    Password hashing context
+
+    Args:
+        list schemes: passlib schemes, the first one hashes new passwords
+        dict rounds: optional rounds per scheme, hashes made with other rounds are out of date
+        list legacy: schemes older hashes may use, still verified after dropping out of schemes
+    Returns:
+        CryptContext that flags hashes of any other listed scheme or rounds for rehashing
+    """
+    known = list(schemes) + [scheme for scheme in legacy if scheme not in schemes]
+    settings = {}
+    for scheme, scheme_rounds in rounds.items():
+        for setting in ("default_rounds", "min_rounds", "max_rounds"):
+            settings[f"{scheme}__{setting}"] = scheme_rounds
+    return CryptContext(schemes=known, default=schemes[0], deprecated="auto", **settings)
+
+
+def get_password_context() -> CryptContext:
+    """The app's password hashing context"""
+    return current_app.extensions["password_context"]
+
+
+def check_rate(username: str) -> None:
+    """Raises a RateLimitError if this IP or username is out of attempts, before any hashing"""
+    if not current_app.extensions["auth_limiter"].allow(f"ip:{g.ip}", f"user:{username}"):
+        raise RateLimitError("Too many attempts, please wait a minute and try again.")
+
+
 @bp.before_app_request
 def load_logged_in_user():
     """
@@ -45,28 +168,24 @@ def load_logged_in_user():
     user_id = session.get("user_id")
     g.ip = request.remote_addr
 
-    if user_id is None:
+    if user_id is None or request.endpoint == "static":
+        # static files never need the user
         g.user = None
     else:
-        # pull user from db
-        db = get_db()
-        this_user = db.execute("SELECT * FROM user WHERE id = ?", (user_id,)).fetchone()
-        g.user = this_user["username"]
+        g.user = user_cache.get(user_id, _load_username)
+    g.user_id = user_id if g.user else None
+
+
+def _load_username(user_id: int) -> str | None:
+    """Pull a user's username from the db"""
+    this_user = get_db().execute("SELECT username FROM user WHERE id = ?", (user_id,)).fetchone()
+    return None if this_user is None else this_user["username"]
 
 
 def validate_password(password: str) -> bool:
     """Raises an Authentication Exception if the password does not meet the requirements"""
     # not common requirement
-    common_passwords = []
-    with open(
-        Path(__file__).parent.joinpath("static", "CommonPassword.txt"),
-        "r",
-        encoding="UTF-8",
-    ) as common_file:
-        for line in common_file.readlines():
-            common_passwords.append(line.strip().lower())
-
-    if password.strip().lower() in common_passwords:
+    if password in current_app.extensions["common_passwords"]:
         raise AuthError("Password must not be in commonly known password list.")
 
     # length requirement
@@ -114,10 +233,11 @@ def register():
             if not password:
                 raise AuthError("Password is required.")
 
+            check_rate(username)
             validate_password(password)
 
             # hash the password
-            password = sha256_crypt.hash(password)
+            password = get_password_context().hash(password)
 
             # add user to the database
             try:
@@ -132,6 +252,8 @@ def register():
 
             return redirect(url_for("auth.login"))
 
+        except RateLimitError:
+            return render_template("auth/register.html"), 429
         except AuthError:
             # no need to do anything here, error already flashed
             pass
@@ -152,6 +274,7 @@ def login():
             # pull data from request form
             username = request.form["username"]
             password = request.form["password"]
+            check_rate(username)
 
             # pull user from db
             db = get_db()
@@ -159,12 +282,30 @@ def login():
                 "SELECT * FROM user WHERE username = ?", (username,)
             ).fetchone()
 
+            context = get_password_context()
             if this_user is None:
-                # this user doesn't exist in the db
+                # this user doesn't exist in the db, hash anyway so the timing doesn't tell
+                context.dummy_verify()
                 raise AuthError("User is none")
-            if not sha256_crypt.verify(password, this_user["password"]):
+            try:
+                valid, new_hash = context.verify_and_update(password, this_user["password"])
+            except UnknownHashError:
+                # hashed with a scheme no longer configured, a deployment error, not the user's
+                current_app.logger.error(
+                    "Password of user %s uses a scheme missing from PASSWORD_SCHEMES "
+                    "and PASSWORD_LEGACY_SCHEMES",
+                    this_user["id"],
+                )
+                raise AuthError("Unknown password hash scheme")
+            if not valid:
                 # password doesn't match
                 raise AuthError("Pass doesn't match")
+            if new_hash is not None:
+                # hashed with an old scheme or rounds, upgrade it now we know the password
+                db.execute(
+                    "UPDATE user SET password = ? WHERE id = ?", (new_hash, this_user["id"])
+                )
+                db.commit()
 
             # clear the session and set current user
             session.clear()
@@ -174,6 +315,8 @@ def login():
 
             # send user to landing page once logged in
             return redirect(url_for("routes.landing"))
+        except RateLimitError:
+            return render_template("auth/login.html"), 429
         except AuthError:
             # no need to do anything here, error already flashed
             pass
@@ -203,6 +346,8 @@ def update():
             if password != confirm:
                 raise AuthError("New Password and Confirm Password fields must match")
 
+            check_rate(g.user)
+
             # get this user's current password
             # pull user from db
             db = get_db()
@@ -211,11 +356,12 @@ def update():
             ).fetchone()
 
             # verify it isn't the same
-            if sha256_crypt.verify(password, this_user["password"]):
+            context = get_password_context()
+            if context.verify(password, this_user["password"]):
                 raise AuthError("Cannot use same password.")
 
             # hash the password
-            password = sha256_crypt.hash(password)
+            password = context.hash(password)
 
             # update this user in the auth pickle
             db.execute(
@@ -226,9 +372,12 @@ def update():
                 ),
             )
             db.commit()
+            user_cache.invalidate(session["user_id"])
 
             # send feedback to the end user
             flash("Password successfully changed!", "info")
+        except RateLimitError:
+            return render_template("auth/update.html"), 429
         except AuthError:
             # no need to do anything here, error already flashed/logged
             pass
@@ -241,3 +390,15 @@ def logout():
     """Clear current session and send back to login page"""
     session.clear()
     return redirect(url_for("auth.login"))
+
+
+def init_app():
+    """Initialize app w/common password list, password hashing and auth rate limiting"""
+    config = current_app.config
+    current_app.extensions["common_passwords"] = CommonPasswords()
+    current_app.extensions["password_context"] = password_context(
+        config["PASSWORD_SCHEMES"], config["PASSWORD_ROUNDS"], config["PASSWORD_LEGACY_SCHEMES"]
+    )
+    current_app.extensions["auth_limiter"] = TokenBucketLimiter(
+        config["AUTH_RATE"], config["AUTH_BURST"]
+    )
@@ -3,43 +3,134 @@ DB
 ==
 SQLite Database connection
 
+Connections are pooled per thread: each worker thread opens one connection per
+database the first time it needs it, sets its pragmas once, and reuses it (and its
+prepared statement cache) for every request after that.
+
+Every user's transactions live in their own store, TRANSACTIONS/<user id>.sqlite,
+so no query can ever see another user's data. Each thread keeps the stores of the
+MAX_STORES users it served most recently open.
+
 Notes
 -----
 https://flask.palletsprojects.com/en/3.0.x/tutorial/database/
 """
 
 import sqlite3
+import threading
+from pathlib import Path
 
 import click
 from flask import current_app, g
 
+from finanalyzer.database import TransactionStore
+
+# prepared statements kept per connection
+CACHED_STATEMENTS = 256
+# seconds to wait on another worker's write lock
+BUSY_TIMEOUT = 30.0
+# transaction stores each thread keeps open, least recently used are closed first
+MAX_STORES = 32
+
+
+class _Pool(threading.local):
+    """Connections opened by the current thread, keyed by database path"""
+
+    connections: dict[Path, sqlite3.Connection]
+    stores: dict[Path, TransactionStore]
+
+    def __init__(self) -> None:
+        self.connections = {}
+        self.stores = {}
+
+
+_pool = _Pool()
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    """New connection with the pragmas every pooled connection uses"""
+    connection = sqlite3.connect(
+        path,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        cached_statements=CACHED_STATEMENTS,
+        timeout=BUSY_TIMEOUT,
+    )
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
 
 def get_db():
-    """Init database connection"""
+    """This thread's pooled database connection"""
     if "db" not in g:
-
-        g.db = sqlite3.connect(
-            current_app.config["DATABASE"], detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        path = Path(current_app.config["DATABASE"])
+        if path not in _pool.connections:
+            _pool.connections[path] = _connect(path)
+        g.db = _pool.connections[path]
 
     return g.db
 
 
+def transactions_path(user_id: int) -> Path:
+    """A user's transaction store"""
+    return Path(current_app.config["TRANSACTIONS"], f"{int(user_id)}.sqlite")
+
+
+def get_transactions():
+    """The logged in user's transaction store, pooled per thread"""
+    if "transactions" not in g:
+        path = transactions_path(g.user_id)
+        store = _pool.stores.pop(path, None)
+        if store is None:
+            store = TransactionStore(path)
+            if len(_pool.stores) >= MAX_STORES:
+                _pool.stores.pop(next(iter(_pool.stores))).close()
+        # most recently used last
+        _pool.stores[path] = store
+        g.transactions = store
+
+    return g.transactions
+
+
 def close_db(_=None):
-    """Close database connection"""
+    """Hand the database connections back to the pool"""
     db = g.pop("db", None)
 
-    if db is not None:
-        db.close()
+    if db is not None and db.in_transaction:
+        # don't leak an uncommitted transaction into the next request
+        db.rollback()
+
+    g.pop("transactions", None)
+
+
+def close_pool():
+    """Close this thread's pooled connections"""
+    for connection in _pool.connections.values():
+        connection.close()
+    for store in _pool.stores.values():
+        store.close()
+    _pool.connections.clear()
+    _pool.stores.clear()
 
 
 def init_db():
-    """Initializes the db using the schema.sql file"""
+    """Clears the db and initializes it using the schema.sql file"""
+    db = get_db()
+    db.executescript("DROP TABLE IF EXISTS user; DROP TABLE IF EXISTS job;")
+    ensure_db()
+
+
+def ensure_db():
+    """
+    Creates any missing tables using the schema.sql file
+    Every statement is IF NOT EXISTS and runs under an exclusive lock,
+    so worker processes starting together can all call this safely
+    """
     db = get_db()
 
     with current_app.open_resource("schema.sql") as f:
-        db.executescript(f.read().decode("utf8"))
+        db.executescript(f"BEGIN EXCLUSIVE;\n{f.read().decode('utf8')}\nCOMMIT;")
 
 
 @click.command("init-db")
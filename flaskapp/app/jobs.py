@@ -0,0 +1,205 @@
+"""
+Jobs
+==============
+In-process background job queue for work too slow to do inside a request
+
+Each worker process runs the jobs it accepted one at a time on a single background
+thread and records their progress in the app's database, so whichever worker handles
+a status request can answer it. There is no broker to run, a job that was queued or
+running when its process stopped is simply never finished.
+"""
+
+import json
+import logging
+import sqlite3
+from collections.abc import Callable
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from uuid import uuid4
+
+import pandas as pd
+from flask import current_app
+
+from finanalyzer.database import TransactionStore
+from finanalyzer.mappings import MappingStore
+from finanalyzer.transactions import clean_transactions
+from flaskapp.app.db import BUSY_TIMEOUT, get_db
+
+logger = logging.getLogger(__name__)
+
+# jobs kept around for their status, oldest are forgotten first
+MAX_JOBS = 256
+
+Progress = Callable[[float, str], None]
+
+
+class Job:
+    """A queued background job and its progress"""
+
+    id: str
+    kind: str
+    owner: str
+    state: str
+    progress: float
+    message: str
+    result: dict | None
+
+    def __init__(self, kind: str, owner: str) -> None:
+        self.id = uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.state = "queued"
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        job = cls(row["kind"], row["owner"])
+        job.id = row["id"]
+        job.state = row["state"]
+        job.progress = row["progress"]
+        job.message = row["message"]
+        job.result = None if row["result"] is None else json.loads(row["result"])
+        return job
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "progress": round(self.progress, 3),
+            "message": self.message,
+            "result": self.result,
+        }
+
+
+class JobQueue:
+    """Runs this process's jobs in submission order on a background thread"""
+
+    __executor: ThreadPoolExecutor
+    __database: Path
+
+    def __init__(self, database: Path) -> None:
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs")
+        self.__database = Path(database)
+
+    def submit(self, kind: str, owner: str, task: Callable[[Progress], dict]) -> Job:
+        """
+        Queue a job
+
+        Args:
+            str kind: what the job does, shown in its status
+            str owner: username allowed to see the job
+            Callable task: called with a progress(fraction, message) callback, returns the job result
+        Returns:
+            the queued Job
+        """
+        job = Job(kind, owner)
+        db = get_db()
+        _save(db, job)
+        with db:
+            db.execute(
+                "DELETE FROM job WHERE id NOT IN (SELECT id FROM job ORDER BY created DESC LIMIT ?)",
+                (MAX_JOBS,),
+            )
+        self.__executor.submit(self.__run, job, task)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        """A job queued by any worker process"""
+        row = get_db().execute("SELECT * FROM job WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else Job.from_row(row)
+
+    def shutdown(self) -> None:
+        self.__executor.shutdown(wait=True)
+
+    def __run(self, job: Job, task: Callable[[Progress], dict]) -> None:
+        with closing(sqlite3.connect(self.__database, timeout=BUSY_TIMEOUT)) as db:
+
+            def progress(fraction: float, message: str) -> None:
+                job.progress = fraction
+                job.message = message
+                _save(db, job)
+
+            job.state = "running"
+            _save(db, job)
+            try:
+                job.result = task(progress)
+            except Exception:
+                logger.exception("%s job %s failed", job.kind, job.id)
+                job.state = "failed"
+                job.message = "Job failed, see the server log"
+            else:
+                job.progress = 1.0
+                job.state = "done"
+            _save(db, job)
+
+
+def _save(db: sqlite3.Connection, job: Job) -> None:
+    """Insert or update a job's row"""
+    with db:
+        db.execute(
+            "INSERT INTO job (id, kind, owner, state, progress, message, result) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+            "state = excluded.state, progress = excluded.progress, "
+            "message = excluded.message, result = excluded.result",
+            (
+                job.id,
+                job.kind,
+                job.owner,
+                job.state,
+                job.progress,
+                job.message,
+                None if job.result is None else json.dumps(job.result),
+            ),
+        )
+
+
+def ingest_task(path: Path, database: Path) -> Callable[[Progress], dict]:
+    """
+    Job that cleans and categorizes an uploaded export, loads it into the store and deletes it
+
+    The export is parsed directly rather than through finanalyzer's cache, which is shared
+    by every user and lives in the package directory. A failed export is kept for inspection
+    """
+
+    def task(progress: Progress) -> dict:
+        progress(0.0, "Reading and categorizing transactions")
+        # read from disk, the mappings may have been edited by another process
+        categorizer = MappingStore().categorizer()
+        # transfers included, a later recategorize may turn them into spending
+        df = clean_transactions(pd.read_csv(path), categorizer, transfers=True)
+        progress(0.5, f"Loading {len(df)} transactions")
+        with TransactionStore(database) as store:
+            inserted = store.load(df)
+        path.unlink(missing_ok=True)
+        return {"transactions": len(df), "inserted": inserted}
+
+    return task
+
+
+def recategorize_task(database: Path) -> Callable[[Progress], dict]:
+    """Job that recategorizes all history with the mappings as currently saved"""
+
+    def task(progress: Progress) -> dict:
+        progress(0.0, "Loading category mappings")
+        # read from disk, the mappings may have been edited by another process
+        categorizer = MappingStore().categorizer()
+        progress(0.1, "Recategorizing transactions")
+        with TransactionStore(database) as store:
+            changed = store.recategorize(categorizer)
+        return {"changed": changed}
+
+    return task
+
+
+def get_jobs() -> JobQueue:
+    """The app's job queue"""
+    return current_app.extensions["jobs"]
+
+
+def init_app():
+    """Initialize app w/job queue"""
+    current_app.extensions["jobs"] = JobQueue(current_app.config["DATABASE"])
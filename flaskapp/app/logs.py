@@ -0,0 +1,83 @@
+"""
+Logs
+==============
+Non-blocking logging to a dated log file per day
+
+Request threads only put records on a queue, a QueueListener thread formats them
+and does the disk writes. Records go to instance/logs/<date>.log and move to a new
+file at midnight without renaming anything, so several worker processes can append
+to the same file safely.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import time
+from datetime import date
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from pathlib import Path
+
+FORMAT = "[%(asctime)s] %(levelname)s in %(module)s: %(message)s"
+
+# started once per process by start_logging
+_listener: QueueListener | None = None
+
+
+class DailyFileHandler(TimedRotatingFileHandler):
+    """Appends to <directory>/<date>.log, switching files at midnight and keeping backup_count days"""
+
+    directory: Path
+
+    def __init__(self, directory: str | Path, backup_count: int = 30) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(exist_ok=True, parents=True)
+        super().__init__(
+            self.__today(), when="midnight", backupCount=backup_count, encoding="UTF-8", delay=True
+        )
+
+    def doRollover(self) -> None:
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self.baseFilename = os.path.abspath(self.__today())
+        self.rolloverAt = self.computeRollover(int(time.time()))
+        if self.backupCount > 0:
+            for old in sorted(self.directory.glob("*.log"))[: -self.backupCount]:
+                # another process may have pruned it already
+                old.unlink(missing_ok=True)
+
+    def __today(self) -> Path:
+        return self.directory / f"{date.today()}.log"
+
+
+def start_logging(directory: str | Path, backup_count: int = 30, level: int = logging.INFO) -> None:
+    """
+    Route the root logger through a queue to a DailyFileHandler, once per process
+
+    Args:
+        Path directory: log file directory
+        int backup_count: days of log files kept
+        int level: root logger level
+    """
+    if _listener is not None:
+        return
+    _start(directory, backup_count, level)
+    # the listener thread doesn't survive a fork (e.g. a server preloading the app)
+    os.register_at_fork(after_in_child=lambda: _start(directory, backup_count, level))
+
+
+def _start(directory: str | Path, backup_count: int, level: int) -> None:
+    """Start a listener, replacing any queue handler a parent process left behind"""
+    global _listener
+    handler = DailyFileHandler(directory, backup_count)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    records = queue.SimpleQueue()
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers = [h for h in root.handlers if not isinstance(h, QueueHandler)]
+    root.addHandler(QueueHandler(records))
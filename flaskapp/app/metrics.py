@@ -0,0 +1,115 @@
+"""
+Metrics
+==============
+Per-request stage timings and the /metrics endpoint
+
+Every request records the finanalyzer stages it runs (sql, aggregate, render...)
+with its own Recorder. The timings go back to the browser in a Server-Timing header,
+so they show up in the devtools network panel, and are added to the process wide
+totals served as JSON by /metrics, together with how long this worker took to start.
+Totals are per worker process.
+
+/metrics is open to logged in users, or to anyone sending
+"Authorization: Bearer <METRICS_TOKEN>" when METRICS_TOKEN is configured.
+"""
+
+import hmac
+import threading
+import time
+
+from flask import Blueprint, abort, current_app, g, jsonify, request
+
+from finanalyzer.instrument import Recorder, activate, deactivate
+
+bp = Blueprint("metrics", __name__)
+
+
+class AppMetrics:
+    """Process wide request counts, durations and stage totals"""
+
+    __requests: dict[str, list]
+    __stages: Recorder
+    __startup: dict[str, float]
+    __started: float
+    __lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.__requests = {}
+        self.__stages = Recorder()
+        self.__startup = {}
+        self.__started = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def startup(self, **seconds: float) -> None:
+        """Record how long parts of starting this worker took"""
+        self.__startup.update(seconds)
+
+    def record(self, endpoint: str, seconds: float, recorder: Recorder) -> None:
+        with self.__lock:
+            totals = self.__requests.setdefault(endpoint, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+        self.__stages.merge(recorder)
+
+    def snapshot(self) -> dict:
+        with self.__lock:
+            requests = {
+                endpoint: {"count": count, "seconds": seconds, "mean_ms": seconds / count * 1000}
+                for endpoint, (count, seconds) in self.__requests.items()
+            }
+        return {
+            "uptime_seconds": time.monotonic() - self.__started,
+            "startup_seconds": self.__startup,
+            "requests": requests,
+            "stages": self.__stages.stages(),
+        }
+
+
+def get_metrics() -> AppMetrics:
+    """The app's metrics"""
+    return current_app.extensions["metrics"]
+
+
+def start_request():
+    """Start recording this request's stages"""
+    g.recorder = Recorder()
+    g.recorder_token = activate(g.recorder)
+    g.request_started = time.perf_counter()
+
+
+def finish_request(response):
+    """Send this request's stages as Server-Timing and add them to the totals"""
+    if "recorder" not in g:
+        return response
+    seconds = time.perf_counter() - g.request_started
+    timings = g.recorder.server_timing()
+    total = f"total;dur={seconds * 1000:.1f}"
+    response.headers["Server-Timing"] = f"{timings}, {total}" if timings else total
+    get_metrics().record(request.endpoint or "unmatched", seconds, g.recorder)
+    return response
+
+
+def stop_request(_=None):
+    """Stop recording, even if the request failed"""
+    token = g.pop("recorder_token", None)
+    if token is not None:
+        deactivate(token)
+
+
+@bp.route("/metrics")
+def metrics():
+    """Request and stage timings of this worker process"""
+    token = current_app.config.get("METRICS_TOKEN")
+    authorization = request.headers.get("Authorization", "")
+    authorized = token and hmac.compare_digest(authorization, f"Bearer {token}")
+    if not (g.user or authorized):
+        abort(401)
+    return jsonify(get_metrics().snapshot())
+
+
+def init_app():
+    """Initialize app w/request timing, before any other hook so timings include them"""
+    current_app.extensions["metrics"] = AppMetrics()
+    current_app.before_request(start_request)
+    current_app.after_request(finish_request)
+    current_app.teardown_request(stop_request)
@@ -0,0 +1,58 @@
+"""
+Rate Limit
+==============
+In-process token bucket rate limiting
+
+Each key (an IP address, a username) gets a bucket that holds up to `burst`
+tokens and refills at `rate` tokens per second. An attempt spends one token from
+every key it is made under, and is refused if any of them is empty, so checking
+is a couple of dict lookups and never touches the database or the password hasher.
+Limits are per process, a multi-worker deployment allows workers x burst.
+"""
+
+import threading
+import time
+
+# buckets kept before full ones are pruned
+MAX_BUCKETS = 10_000
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by anything hashable"""
+
+    __rate: float
+    __burst: float
+    __buckets: dict[str, tuple[float, float]]
+    __lock: threading.Lock
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.__rate = rate
+        self.__burst = burst
+        self.__buckets = {}
+        self.__lock = threading.Lock()
+
+    def allow(self, *keys: str) -> bool:
+        """Spend a token from each key's bucket, False (and nothing spent) if any is empty"""
+        now = time.monotonic()
+        with self.__lock:
+            tokens = [self.__tokens(key, now) for key in keys]
+            if any(available < 1 for available in tokens):
+                return False
+            for key, available in zip(keys, tokens):
+                self.__buckets[key] = (available - 1, now)
+            if len(self.__buckets) > MAX_BUCKETS:
+                self.__prune(now)
+        return True
+
+    def __tokens(self, key: str, now: float) -> float:
+        """Tokens in a bucket after refilling it up to now"""
+        if key not in self.__buckets:
+            return self.__burst
+        tokens, updated = self.__buckets[key]
+        return min(self.__burst, tokens + (now - updated) * self.__rate)
+
+    def __prune(self, now: float) -> None:
+        """Forget buckets that have refilled, they behave the same as new ones"""
+        full = [key for key in self.__buckets if self.__tokens(key, now) >= self.__burst]
+        for key in full:
+            del self.__buckets[key]
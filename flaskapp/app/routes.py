@@ -4,12 +4,20 @@ Routes
 Flask Blueprint for rendering non-auth routes
 """
 
-from datetime import datetime
+from datetime import date, datetime
 
-from flask import Blueprint, g, redirect, render_template, url_for
+from flask import Blueprint, Response, abort, g, redirect, render_template, request, url_for
+
+from finanalyzer.aggregate import split_income, totals
+from finanalyzer.analyze_finances import next_month
+from finanalyzer.render import FORMATS, ChartCache, render_pie
+from flaskapp.app.db import get_transactions
 
 bp = Blueprint("routes", __name__)
 
+# rendered charts, shared by every request handled by this process
+charts = ChartCache()
+
 @bp.before_request
 def before_request():
     """Check if logged in first"""
@@ -25,4 +33,24 @@ def landing():
     return render_template(
         "routes/landing.html",
         current_datetime=date_string,
+        year=today_.year,
+        month=today_.month,
     )
+
+@bp.route("/charts/<int:year>/<int:month>.<fmt>")
+def month_chart(year: int, month: int, fmt: str):
+    """Renders a month's spending per category, ?costs=1 leaves out income"""
+    if fmt not in FORMATS or not 1 <= month <= 12:
+        abort(404)
+    just_costs = request.args.get("costs", "0") == "1"
+    first = date(year, month, 1)
+    store = get_transactions()
+
+    def render() -> bytes:
+        summary = store.category_totals(first, next_month(first))
+        if just_costs:
+            _, summary = split_income(summary)
+        return render_pie(totals(summary), fmt, title=first.strftime("%B %Y"))
+
+    key = (g.user_id, first, just_costs, fmt, store.version)
+    return Response(charts.get_or_render(key, render), mimetype=FORMATS[fmt])
@@ -9,7 +9,8 @@ A lot of this project is based on the Flask tutorial:
 Based on https://flask.palletsprojects.com/en/3.0.x/tutorial/
 """
 
-from flaskapp.app import app_object
+from flaskapp.app import create_app
 
+app_object = create_app()
 app_object.logger.info("Starting app...")
 app_object.run(debug=True)
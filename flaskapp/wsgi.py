@@ -0,0 +1,16 @@
+"""
+WSGI
+=============
+Production entry point
+
+Serve with several worker processes, e.g.
+    gunicorn --workers 4 --threads 4 --bind 0.0.0.0:8000 flaskapp.wsgi:app
+
+Every worker creates its own app, tables are created race free and job status is
+shared through the database. Per process state (the user cache, auth rate limits,
+rendered charts) is not shared, so auth limits allow up to workers x AUTH_BURST.
+"""
+
+from flaskapp.app import create_app
+
+app = create_app()